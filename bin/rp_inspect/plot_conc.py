@@ -73,15 +73,15 @@ if __name__ == '__main__':
     src = sys.argv[1]
     session = ra.Session.create(src, 'radical.pilot')
 
-    data = {metric: session.concurrency(event=metrics[metric], sampling=1.0)
+    data = {metric: session.concurrency(event=metrics[metric], sampling=1.0,
+                                        as_array=True)
             for metric in metrics}
 
     # prep figure
     fig, ax = plt.subplots(figsize=ra.get_plotsize(RES))
 
     for metric in data:
-        x = [e[0] for e in data[metric]]
-        y = [e[1] for e in data[metric]]
+        x, y = data[metric]
         plt.step(x, y, color=colors[metric], label=to_latex(metric),
                        where='post')
 
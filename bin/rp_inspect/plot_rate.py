@@ -66,14 +66,12 @@ if __name__ == '__main__':
     session = ra.Session.create(src, stype)
 
     # FIXME: adaptive sampling (100 bins over range?)
-    data = {metric: session.rate(event=metrics[metric], sampling=1.0)
-            for metric in metrics}
+    data = session.rates(metrics, sampling=1.0, as_array=True)
 
     fig, ax = plt.subplots(figsize=ra.get_plotsize(RES))
 
     for metric in data:
-        x = [e[0] for e in data[metric]]
-        y = [e[1] for e in data[metric]]
+        x, y = data[metric]
         # FIXME: use cmap
         ax.plot(x, y, color=colors[metric], label=to_latex(metric))
       # ax.step(x, y, color=colors[metric], label=to_latex(metric),
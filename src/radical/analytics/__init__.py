@@ -15,9 +15,11 @@ import radical.utils as _ru
 # ------------------------------------------------------------------------------
 #
 from .experiment import Experiment
-from .session    import Session
+from .run        import Run
+from .session    import Session, SessionView
 from .entity     import Entity
 from .plotter    import Plotter
+from .cache      import Cache
 
 
 from .utils import get_plotsize, get_mplstyle, stack_transitions
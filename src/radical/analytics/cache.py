@@ -0,0 +1,457 @@
+
+import os
+import fcntl
+import shutil
+import hashlib
+import tempfile
+
+import radical.utils as ru
+
+
+# the cache is invalidated whenever the RA version changes, as the pickled
+# session layout may differ between versions
+_mod_root = os.path.dirname(__file__)
+_version  = ru.get_version(_mod_root)[4]
+
+# number of bytes read from the head and tail of each file for `fast_hash`
+_HASH_CHUNK = 64 * 1024
+
+
+# ------------------------------------------------------------------------------
+#
+def _list_files(src):
+    '''
+    Return a sorted list of all files in `src` (or `[src]` if `src` is a file).
+    '''
+
+    if not os.path.isdir(src):
+        return [src]
+
+    ret   = list()
+    paths = [src]
+    while paths:
+        with os.scandir(paths.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    paths.append(entry.path)
+                elif entry.is_file():
+                    ret.append(entry.path)
+
+    return sorted(ret)
+
+
+# ------------------------------------------------------------------------------
+#
+def fingerprint(src, stype, fast_hash=False):
+    '''
+    Compute a fingerprint of the session source `src` (a profile, a tarball,
+    or a directory tree of profiles and session descriptions).  The fingerprint
+    covers the path, size and modification time of all source files, the
+    session type `stype`, and the RA version.  If `fast_hash` is set, the
+    head and tail of each source file are hashed as well, which detects
+    content changes which retain file size and mtime.
+
+    Returns a hex digest string.
+    '''
+
+    src = os.path.abspath(src)
+    md  = hashlib.sha1()
+
+    md.update(('%s:%s:%s\n' % (_version, stype, src)).encode())
+
+    for path in _list_files(src):
+
+        stat = os.stat(path)
+        md.update(('%s:%d:%d\n' % (os.path.relpath(path, src),
+                                   stat.st_size, stat.st_mtime_ns)).encode())
+
+        if fast_hash:
+            with open(path, 'rb') as fin:
+                md.update(fin.read(_HASH_CHUNK))
+                if stat.st_size > 2 * _HASH_CHUNK:
+                    fin.seek(-_HASH_CHUNK, os.SEEK_END)
+                    md.update(fin.read(_HASH_CHUNK))
+
+    return md.hexdigest()
+
+
+# ------------------------------------------------------------------------------
+#
+def load(path):
+    '''
+    Load a cached session snapshot from `path`.  Returns `None` if no such
+    cache entry exists or if it cannot be read.
+    '''
+
+    from .session import Session
+
+    if not os.path.isdir(path):
+        return None
+
+    try:
+        return Session.load(path)
+
+    except Exception:
+        return None
+
+
+# ------------------------------------------------------------------------------
+#
+def store(path, session):
+    '''
+    Store a snapshot of `session` in the cache entry `path`.  The snapshot is
+    written to a temporary directory in the cache directory which is then
+    atomically moved into place, so that concurrent readers never see
+    partially written cache entries.
+    '''
+
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(path),
+                           prefix='.%s.' % os.path.basename(path))
+    try:
+        session.save(tmp)
+
+        if os.path.exists(path):
+            # replace an unreadable entry
+            shutil.rmtree(path)
+
+        os.rename(tmp, path)
+
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+# ------------------------------------------------------------------------------
+#
+def _size(path):
+    '''
+    Return the size of a file, or of all files in a directory tree.
+    '''
+
+    if not os.path.isdir(path):
+        return os.stat(path).st_size
+
+    return sum(os.stat(f).st_size for f in _list_files(path))
+
+
+# ------------------------------------------------------------------------------
+#
+class Cache(object):
+
+    _ext = 'snap'
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, base=None, budget=None):
+        '''
+        Manage a directory of cached session snapshots (see `Session.create()`
+        and `Session.save()`).  Cache entries are named `<sid>.<key>.<ext>`,
+        where `key` is the fingerprint of the session source.
+
+        The cache is bounded by a `budget` in bytes: whenever a new entry is
+        stored, the least recently used entries (by access time) are evicted
+        until the cache size is within budget again.  Pinned entries are never
+        evicted.  The budget defaults to `$RADICAL_ANALYTICS_CACHE_BUDGET`, or
+        to 10 GB if that is not set - a budget of `0` disables eviction.
+
+        The default cache directory is
+        `$RADICAL_BASE/.radical/analytics/cache/`.
+        '''
+
+        if not base:
+            base = ru.get_radical_base('radical.analytics.cache')
+
+        if budget is None:
+            budget = int(os.environ.get('RADICAL_ANALYTICS_CACHE_BUDGET',
+                                        10 * 1024 ** 3))
+
+        self._base   = base
+        self._budget = budget
+        self._hits   = 0
+        self._misses = 0
+
+        ru.rec_makedir(self._base)
+
+
+    # --------------------------------------------------------------------------
+    #
+    @property
+    def base(self):
+        return self._base
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get_path(self, sid, key):
+        '''
+        Return the cache entry name for the session `sid` with fingerprint
+        `key`.
+        '''
+
+        return os.path.join(self._base, '%s.%s.%s' % (sid, key, self._ext))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get(self, path, create):
+        '''
+        Return the session cached at `path`.  If no such session exists, it is
+        created by calling `create()` and stored in the cache.  A lock on the
+        cache entry ensures that concurrent processes sharing the cache will
+        create the session only once: all others will wait for it and then load
+        it from the cache.
+
+        Returns a tuple `(session, cached)`, where `cached` indicates whether
+        the session was loaded from the cache.
+        '''
+
+        session = self._load(path)
+        if session is not None:
+            return session, True
+
+        # NOTE: `flock` locks are released by the OS if the locking process
+        #       dies, so a crashed build cannot block other processes forever.
+        with open('%s.lock' % path, 'a') as lock:
+
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            # another process may have created the session while we waited
+            session = self._load(path)
+            if session is not None:
+                return session, True
+
+            self._misses += 1
+            session = create()
+            store(path, session)
+
+        self.evict()
+
+        return session, False
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _load(self, path):
+
+        session = load(path)
+        if session is not None:
+            self._hits += 1
+            self._touch(path)
+
+        return session
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _touch(self, path):
+        '''
+        Mark the given entry as used.  We do not rely on the file system to
+        track access times (cache directories may be mounted `noatime`, and
+        listing entry directories may update their access time), but instead
+        record the last access as modification time of the entry - entries are
+        never modified after creation.
+        '''
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+    # --------------------------------------------------------------------------
+    #
+    def entries(self):
+        '''
+        Return a list of all cache entries, least recently used first.  Each
+        entry is described by a dict::
+
+            {
+              'path'   : '/path/to/<sid>.<key>.<ext>',
+              'sid'    : '<sid>',
+              'size'   : 1024,         # bytes
+              'atime'  : 1700000000.0, # last access (epoch)
+              'pinned' : False
+            }
+        '''
+
+        ret    = list()
+        suffix = '.%s' % self._ext
+
+        with os.scandir(self._base) as it:
+            for entry in it:
+
+                if entry.name.startswith('.') or \
+                   not entry.name.endswith(suffix):
+                    continue
+
+                try:
+                    ret.append({'path'  : entry.path,
+                                'sid'   : entry.name.rsplit('.', 2)[0],
+                                'size'  : _size(entry.path),
+                                'atime' : entry.stat().st_mtime,
+                                'pinned': os.path.exists('%s.pin'
+                                                         % entry.path)})
+                except OSError:
+                    # entry got removed concurrently
+                    pass
+
+        return sorted(ret, key=lambda x: x['atime'])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def size(self):
+        '''
+        Return the total size of all cache entries in bytes.
+        '''
+
+        return sum(e['size'] for e in self.entries())
+
+
+    # --------------------------------------------------------------------------
+    #
+    def pin(self, path, pinned=True):
+        '''
+        Pin (or unpin) the cache entry at `path`: pinned entries are never
+        evicted, and are only removed by `purge(pinned=True)`.
+        '''
+
+        if pinned:
+            with open('%s.pin' % path, 'a'):
+                pass
+
+        elif os.path.exists('%s.pin' % path):
+            os.unlink('%s.pin' % path)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def unpin(self, path):
+
+        self.pin(path, pinned=False)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def remove(self, path):
+        '''
+        Remove the cache entry at `path` (and its lock and pin files).
+        '''
+
+        for fname in [path, '%s.lock' % path, '%s.pin' % path]:
+            try:
+                if os.path.isdir(fname): shutil.rmtree(fname)
+                else                   : os.unlink(fname)
+            except FileNotFoundError:
+                pass
+
+
+    # --------------------------------------------------------------------------
+    #
+    def purge(self, sid=None, pinned=False):
+        '''
+        Remove all cache entries (or all entries for session `sid`).  Pinned
+        entries are only removed if `pinned` is set.  Returns the number of
+        removed bytes.
+        '''
+
+        ret = 0
+        for entry in self.entries():
+
+            if sid and entry['sid'] != sid:
+                continue
+
+            if entry['pinned'] and not pinned:
+                continue
+
+            self.remove(entry['path'])
+            ret += entry['size']
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def evict(self, budget=None):
+        '''
+        Remove least recently used, unpinned cache entries until the cache
+        size is within `budget` bytes (defaults to the cache's budget).
+        Returns the number of removed bytes.
+        '''
+
+        if budget is None:
+            budget = self._budget
+
+        if not budget:
+            return 0
+
+        entries = self.entries()
+        total   = sum(e['size'] for e in entries)
+        ret     = 0
+
+        for entry in entries:
+
+            if total <= budget:
+                break
+
+            if entry['pinned']:
+                continue
+
+            self.remove(entry['path'])
+            total -= entry['size']
+            ret   += entry['size']
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def stats(self):
+        '''
+        Return hit / miss counters (for this cache instance) and the current
+        cache size and budget.
+        '''
+
+        entries = self.entries()
+
+        return {'hits'    : self._hits,
+                'misses'  : self._misses,
+                'entries' : len(entries),
+                'size'    : sum(e['size'] for e in entries),
+                'budget'  : self._budget}
+
+
+# ------------------------------------------------------------------------------
+#
+_caches = dict()
+
+
+def get_cache(base=None):
+    '''
+    Return the (process wide) cache instance for the given cache directory
+    (see `Cache`).
+    '''
+
+    if not base:
+        base = ru.get_radical_base('radical.analytics.cache')
+
+    if base not in _caches:
+        _caches[base] = Cache(base)
+
+    return _caches[base]
+
+
+# ------------------------------------------------------------------------------
+
@@ -0,0 +1,196 @@
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------------
+#
+def _samples(t_min, t_max, sampling):
+    '''
+    Return the sampling points `t_min + k * sampling` which are `<= t_max`,
+    plus the first sampling point after `t_max`.  The points are accumulated
+    just like repeatedly adding `sampling` to `t_min` would, so that they
+    match the sampling points of a loop based computation exactly.
+    '''
+
+    n_samples = int(np.floor((t_max - t_min) / sampling)) + 3
+    samples   = np.cumsum(np.append(t_min, np.full(n_samples, sampling)))
+    n_valid   = int(np.searchsorted(samples, t_max, side='right'))
+
+    return samples[:n_valid + 1]
+
+
+# ------------------------------------------------------------------------------
+#
+def concurrency(starts, stops, sampling=None):
+    '''
+    For a set of time ranges given as arrays of `starts` and `stops`, compute
+    how many ranges are active at any point in time.  Returns two arrays, the
+    times at which the concurrency changes and the concurrency values after
+    those changes.  The series starts with a zero value at the first range
+    start.
+
+    If `sampling` is given, the concurrency is instead sampled at regular
+    intervals of `sampling` seconds, starting at the first range start.
+    A sample reports the concurrency right *before* that point in time, and the
+    series is closed with one sample past the last change, which reports the
+    final concurrency value.
+    '''
+
+    starts = np.asarray(starts, dtype=np.float64)
+    stops  = np.asarray(stops,  dtype=np.float64)
+
+    if not len(starts):
+        return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int64)
+
+    # a range start increases concurrency by one at that time stamp, a range
+    # end decreases it again
+    times  = np.concatenate((starts, stops))
+    deltas = np.concatenate((np.ones (len(starts), dtype=np.int64),
+                            -np.ones (len(stops),  dtype=np.int64)))
+
+    order  = np.argsort(times, kind='stable')
+    times  = times[order]
+    conc   = np.cumsum(deltas[order])
+
+    # collapse time stamps (use last value on same time stamps), and make sure
+    # we start at zero (at time of first event)
+    times, first = np.unique(times, return_index=True)
+    last         = np.append(first[1:], len(conc)) - 1
+
+    times  = np.insert(times,      0, times[0])
+    values = np.insert(conc[last], 0, 0)
+
+    if not sampling:
+        return times, values
+
+    # select data points according to sampling: for each sample, find the
+    # last change *before* the sample time
+    samples = _samples(times[0], times[-1], sampling)
+    idx     = np.searchsorted(times, samples[:-1], side='left') - 1
+
+    values = np.append(values[np.maximum(idx, 0)], values[-1])
+
+    return samples, values
+
+
+# ------------------------------------------------------------------------------
+#
+def rate(timestamps, sampling=None):
+    '''
+    For a set of `timestamps`, compute the rate of events per second.  If
+    `sampling` is given, the rate is computed over windows of `sampling`
+    seconds, starting at the first timestamp (the last window ends at the last
+    timestamp).  Otherwise the windows are spanned by each pair of consecutive
+    (distinct) timestamps.  Returns two arrays: the end times of the windows,
+    and the event rates within those windows.  The first window also counts
+    the events at its start time.
+    '''
+
+    timestamps = np.sort(np.asarray(timestamps, dtype=np.float64))
+
+    if not len(timestamps):
+        return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float64)
+
+    if sampling:
+        r_min  = timestamps[0]
+        r_max  = timestamps[-1]
+        times  = _samples(r_min, r_max, sampling)
+        times  = np.append(times[times < r_max], r_max)
+    else:
+        times  = timestamps
+
+    # no two consecutive window bounds can be the same, as that would lead to
+    # a division by zero
+    times  = np.unique(times)
+
+    # count events per window via the cumulative event count at the bounds
+    counts    = np.searchsorted(timestamps, times, side='right')
+    counts[0] = 0
+
+    return times[1:], np.diff(counts) / np.diff(times)
+
+
+# ------------------------------------------------------------------------------
+#
+def collapse(starts, stops, groups=None):
+    '''
+    Vectorized version of `ru.collapse_ranges()`: collapse the time ranges
+    given as arrays of `starts` and `stops` into the minimal set of ranges
+    which cover the same times.  If `groups` is given (an array of group ids
+    with the same length), the ranges are collapsed per group.
+
+    Returns three arrays: the starts and stops of the collapsed ranges, and
+    their group ids (all `0` if no `groups` are given).  The ranges are
+    sorted by group, and then by start time.
+    '''
+
+    starts = np.asarray(starts, dtype=np.float64)
+    stops  = np.asarray(stops,  dtype=np.float64)
+
+    if groups is None:
+        groups = np.zeros(len(starts), dtype=np.int64)
+    groups = np.asarray(groups, dtype=np.int64)
+
+    if not len(starts):
+        return starts, stops, groups
+
+    # ranges are expected as `[start, stop]` with `start <= stop`
+    starts, stops = np.minimum(starts, stops), np.maximum(starts, stops)
+
+    # sort by group and start time.  The order of ranges with the same start
+    # time does not matter for the result, so only the (integer) sort by group
+    # needs to be stable.
+    order  = np.argsort(starts)
+    order  = order[np.argsort(groups[order], kind='stable')]
+    starts = starts[order]
+    stops  = stops [order]
+    groups = groups[order]
+
+    # empty ranges are ignored, unless they come first in their group
+    first     = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    keep      = first | (starts != stops)
+    starts    = starts[keep]
+    stops     = stops [keep]
+    groups    = groups[keep]
+    first     = first [keep]
+
+    # a range starts a new collapsed range if it starts after all previous
+    # ranges of its group ended.  For several groups, the running maximum of
+    # the stop times is computed over ranks which are offset by group, so that
+    # it does not carry over between groups.
+    if groups[0] == groups[-1]:
+        ends    = np.maximum.accumulate(stops)
+        s_ranks = starts
+        e_ranks = ends
+    else:
+        values, ranks = np.unique(np.concatenate((starts, stops)),
+                                  return_inverse=True)
+        offset  = groups * len(values)
+        s_ranks = ranks[:len(starts)] + offset
+        e_ranks = np.maximum.accumulate(ranks[len(starts):] + offset)
+        ends    = values[e_ranks - offset]
+
+    heads     = first.copy()
+    heads[1:] = first[1:] | (s_ranks[1:] > e_ranks[:-1])
+
+    heads  = np.flatnonzero(heads)
+    tails  = np.append(heads[1:], len(starts)) - 1
+
+    return starts[heads], ends[tails], groups[heads]
+
+
+# ------------------------------------------------------------------------------
+#
+def as_series(times, values):
+    '''
+    Convert time series arrays into the list-of-lists form::
+
+        [[time_0, value_0], [time_1, value_1], ...]
+    '''
+
+    return [list(p) for p in zip(times.tolist(), values.tolist())]
+
+
+# ------------------------------------------------------------------------------
+
@@ -1,65 +1,83 @@
 
 import sys
+import bisect
 import pprint
 
+import numpy         as np
 import radical.utils as ru
 
+from .store import EventStore, as_conditions, state_condition, in_ranges
+from .store import range_conditions
+
+
+# ------------------------------------------------------------------------------
+#
+def get_etype(uid, details):
+    """
+    Return the (interned) entity type for the entity with the given uid and
+    details, as taken from the session description's entity tree or, if no
+    such information is available, derived from the uid.
+    """
+
+    etype = details.get('etype')
+
+    # if have no etype tree information, guess the etype from uid
+    if not etype:
+        etype = uid.split('.')[0]
+
+    # entities for which we have no tree information are raptor tasks (they
+    # were created by the master and never saw the client side)
+    # FIXME: this should be sorted out on RP level
+    if not etype:
+        if not details and 'task' in uid:
+            etype = 'raptor.task'
+        else:
+            etype = 'unknown'
+
+    return sys.intern(etype)
+
 
 # ------------------------------------------------------------------------------
 #
 class Entity(object):
 
-    def __init__(self, _uid, _profile, _details):
+    # Entities only keep references to their event store and to the (shared)
+    # entity details of the session description.  Everything else is derived
+    # from those on demand, which keeps entities small for large sessions.
+    # Details missing from the session description are kept per entity.
+    __slots__ = ['_uid', '_etype', '_details', '_store', '_eid',
+                 '_own', '_consistency', '_cache']
+
+    def __init__(self, _uid, _profile, _details, _store=None, _eid=None):
         """
         Args:
             uid (`str`): an ID assumed to be unique in the scope of an RA
                 Session
             profile: a list of profile events for this entity
             details: a dictionary of complementary information on this entity
+                (referenced, not copied - it may be shared between entities)
+            store: an `EventStore` which holds the events of this entity (used
+                instead of `profile`)
+            eid: index of this entity in `store`
         """
 
         assert _uid
-        assert _profile
+
+        if _store is None:
+            assert _profile
+            _store = EventStore(_profile, grouped=False)
+            _eid   = 0
 
         self._uid         = _uid
+        self._etype       = get_etype(_uid, _details)
         self._details     = _details
-        self._etype       = self._details.get('etype')
-        self._description = self._details.get('description', dict())
-        self._cfg         = self._details.get('cfg',         dict())
-        self._resources   = self._details.get('resources',   dict())
-
-        self._name        =  self._description.get('name') \
-                          or self._description.get('job_name') \
-                          or self._uid
+        self._store       = _store
+        self._eid         = _eid
+        self._own         = None
+        self._consistency = None
+        self._cache       = None
 
-        # if have no etype tree information, guess the etype from uid
-        if not self._etype:
-            self._etype = self._uid.split('.')[0]
-
-        # FIXME: this should be sorted out on RP level
-        self._cfg['hostid'] = self._details.get('hostid')
-
-        # entities for which we have no tree information are raptor tasks (they
-        # were created by the master and never saw the client side)
-        # FIXME: this should be sorted out on RP level
-        if not self._etype:
-            if not self._details and 'task' in self._uid:
-                self._etype = 'raptor.task'
-            else:
-                self._etype = 'unknown'
-
-        self._states      = dict()
-        self._events      = list()
-        self._consistency = {'log'         : list(),
-                             'state_model' : None,
-                             'event_model' : None,
-                             'timestamps'  : None}
-
-        self._t_start     = None
-        self._t_stop      = None
-        self._ttc         = None
-
-        self._initialize(_profile)
+        # FIXME: assert state model adherence here (if state model is defined)
 
 
     # --------------------------------------------------------------------------
@@ -68,20 +86,13 @@ class Entity(object):
 
         state = {
                  'uid'         : self._uid,
-                 'name'        : self._name,
                  'etype'       : self._etype,
                  'details'     : self._details,
-                 'description' : self._description,
-                 'resources'   : self._resources,
-                 'cfg'         : self._cfg,
 
-                 'states'      : self._states,
-                 'events'      : self._events,
+                 'store'       : self._store,
+                 'eid'         : self._eid,
+                 'own'         : self._own,
                  'consistency' : self._consistency,
-
-                 't_start'     : self._t_start,
-                 't_stop'      : self._t_stop,
-                 'ttc'         : self._ttc,
                 }
 
         return state
@@ -92,42 +103,46 @@ class Entity(object):
     def __setstate__(self, state):
 
         self._uid          = state['uid']
-        self._etype        = state['etype']
+        self._etype        = sys.intern(state['etype'])
         self._details      = state['details']
-        self._description  = state['description']
-        self._resources    = state['resources']
-        self._cfg          = state['cfg']
 
-        self._states       = state['states']
-        self._events       = state['events']
+        self._store        = state['store']
+        self._eid          = state['eid']
+        self._own          = state['own']
         self._consistency  = state['consistency']
-
-        self._t_start      = state['t_start']
-        self._t_stop       = state['t_stop']
-        self._ttc          = state['ttc']
-
-        self._name         =  self._description.get('name') \
-                           or self._description.get('job_name') \
-                           or self._uid
+        self._cache        = None
 
 
     # --------------------------------------------------------------------------
     #
     @property
     def t_start(self):
-        return self._t_start
+        t_start, _ = self._get_t_range()
+        if t_start is None:
+            return None
+        return t_start - self._store.tzero
 
     @property
     def t_stop(self):
-        return self._t_stop
+        _, t_stop = self._get_t_range()
+        if t_stop is None:
+            return None
+        return t_stop - self._store.tzero
 
     @property
     def ttc(self):
-        return self._ttc
+        t_start, t_stop = self._get_t_range()
+        if t_start is None:
+            return None
+        return t_stop - t_start
 
     @property
     def t_range(self):
-        return [self._t_start, self._t_stop]
+        t_start, t_stop = self._get_t_range()
+        if t_start is None:
+            return [None, None]
+        tzero = self._store.tzero
+        return [t_start - tzero, t_stop - tzero]
 
     @property
     def uid(self):
@@ -135,7 +150,10 @@ class Entity(object):
 
     @property
     def name(self):
-        return self._name
+        description = self.description
+        return description.get('name')     \
+            or description.get('job_name') \
+            or self._uid
 
     @property
     def etype(self):
@@ -143,26 +161,45 @@ class Entity(object):
 
     @property
     def states(self):
-        return self._states
+        cache = self._get_cache()
+        if 'states' not in cache:
+            # the last transition into a state defines the state's event
+            cache['states'] = {e[ru.STATE]: e for e in self.events
+                                              if e[ru.EVENT] == 'state'}
+        return cache['states']
 
     @property
     def description(self):
-        return self._description
+        return self._get_detail('description')
 
     @property
     def resources(self):
-        return self._resources
+        return self._get_detail('resources')
 
     @property
     def cfg(self):
-        return self._cfg
+        cfg = self._get_detail('cfg')
+
+        # FIXME: this should be sorted out on RP level
+        if 'hostid' not in cfg:
+            cfg['hostid'] = self._details.get('hostid')
+
+        return cfg
 
     @property
     def events(self):
-        return self._events
+        cache = self._get_cache()
+        if 'events' not in cache:
+            cache['events'] = self._store.events(*self._store.span(self._eid))
+        return cache['events']
 
     @property
     def consistency(self):
+        if self._consistency is None:
+            self._consistency = {'log'         : list(),
+                                 'state_model' : None,
+                                 'event_model' : None,
+                                 'timestamps'  : None}
         return self._consistency
 
 
@@ -171,7 +208,7 @@ class Entity(object):
     def __str__(self):
 
         return "ra.Entity [%s]: %s\n    states: %s" \
-                % (self.etype, self.uid, list(self._states.keys()))
+                % (self.etype, self.uid, list(self.states.keys()))
 
 
     # --------------------------------------------------------------------------
@@ -183,64 +220,79 @@ class Entity(object):
 
     # --------------------------------------------------------------------------
     #
-    def _initialize(self, profile):
+    def _get_t_range(self):
+        """
+        Return the time stamps of the first and last event of this entity (not
+        corrected for tzero), or `(None, None)` if the entity has no events.
+        Events are time sorted in the store.
+        """
 
-        # only call once
-        assert not self._states
-        assert not self._events
+        begin, end = self._store.span(self._eid)
+        if end == begin:
+            return None, None
 
-        if profile:
-            self._t_start = sys.float_info.max
-            self._t_stop  = sys.float_info.min
+        times = self._store.time
+        return times.item(begin), times.item(end - 1)
 
-        # we expect each event tuple to have `time` and `event`, and expect
-        # 'advance' events to signify a state transition.
-        for event in sorted(profile, key=lambda x: (x[ru.TIME])):
 
-            t = event[ru.TIME]
+    # --------------------------------------------------------------------------
+    #
+    def _get_detail(self, key):
+        """
+        Return the dict `key` from the entity details.  If the details don't
+        have that key, an empty dict is created for this entity on first use,
+        so that changes to it persist (without altering the shared details).
+        """
 
-            self._t_start = min(self._t_start, t)
-            self._t_stop  = max(self._t_stop,  t)
+        if key in self._details:
+            return self._details[key]
 
-            # FIXME: this should be phased out
-            if event[ru.EVENT] in 'advance':
-                event[ru.EVENT] = 'state'
+        if self._own is None:
+            self._own = dict()
 
-            if event[ru.EVENT] == 'state':
-                state = event[ru.STATE]
-                self._states[state] = event
+        if key not in self._own:
+            self._own[key] = dict()
 
-            # we also treat state transitions as generic event.
-            # Because, why not?
-            self._events.append(event)
+        return self._own[key]
 
-        if profile:
-            self._ttc = self._t_stop - self._t_start
 
-        # FIXME: assert state model adherence here (if state model is defined)
+    # --------------------------------------------------------------------------
+    #
+    def _get_cache(self):
+        """
+        Return the cache for data derived from this entity's events (event
+        tuples, states, event times and the event index), which is created on
+        first use.  The cache is dropped if the store's tzero changed since it
+        was created.
+        """
+
+        tzero = self._store.tzero
+        if self._cache is None or self._cache['tzero'] != tzero:
+            self._cache = {'tzero': tzero}
+
+        return self._cache
 
 
     # --------------------------------------------------------------------------
     #
-    def _ensure_tuplelist(self, events):
+    def _get_times(self):
+        """
+        Return (and cache) the time stamps of this entity's events as list.
+        """
 
-        if not events:
-            return []
+        cache = self._get_cache()
+        if 'times' not in cache:
+            begin, end     = self._store.span(self._eid)
+            cache['times'] = self._store.times(slice(begin, end)).tolist()
+
+        return cache['times']
 
-        ret = list()
-        if not isinstance(events, list):
-            events = [events]
 
-        for e in events:
-            if isinstance(e,dict):
-                et = ru.PROF_KEY_MAX * [None]
-                for k,v in list(e.items()):
-                    et[k] = v
-                ret.append(tuple(et))
-            else:
-                ret.append(e)
+    # --------------------------------------------------------------------------
+    #
+    def _ensure_tuplelist(self, events):
 
-        return ret
+        return as_conditions(events)
 
 
     # --------------------------------------------------------------------------
@@ -250,11 +302,11 @@ class Entity(object):
         return {
                 'uid'        : self._uid,
                 'etype'      : self._etype,
-                'states'     : self._states,
-                'events'     : self._events,
-                'cfg'        : self._cfg,
-                'resources'  : self._resources,
-                'description': self._description,
+                'states'     : self.states,
+                'events'     : self.events,
+                'cfg'        : self.cfg,
+                'resources'  : self.resources,
+                'description': self.description,
                }
 
 
@@ -269,7 +321,7 @@ class Entity(object):
     #
     def list_states(self):
 
-        return list(self._states.keys())
+        return list(self.states.keys())
 
 
     # --------------------------------------------------------------------------
@@ -328,44 +380,115 @@ class Entity(object):
         ret   = list()
 
         if not event and not state:
-            # no filters, consider all events
-            ret = self._events
+            # no filters, consider all events (in the given time ranges)
+            if not time:
+                return sorted(self.events)
+
+            events     = self.events
+            begin, end = self._store.span(self._eid)
+            rows       = self._store.window(time, begin, end) - begin
+            return sorted(events[r] for r in rows.tolist())
+
+        times = self._get_times()
 
         for e in event:
-            for x in self._events:
-                if self._match_event(e,x):
-                    ret.append(x[ru.TIME])
+            ret += [times[p] for p in self._positions(e)]
 
         for s in state:
-            if s in self._states:
-                ret.append(self._states[s][ru.TIME])
+            pos = self._positions(state_condition(s))
+            if pos:
+                ret.append(times[pos[-1]])
 
         # apply time filters
         if time:
-            matched = list()
-            for etime in ret:
-                for ttuple in time:
-                    if etime >= ttuple[0] and etime <= etime[1]:
-                        matched.append(etime)
-                        break
-            ret = matched
+            ret = [t for t, m in zip(ret, in_ranges(ret, time).tolist()) if m]
 
         return sorted(ret)
 
 
     # --------------------------------------------------------------------------
     #
-    def _match_event(self, needle, hay):
+    def _match(self, cond):
+        """
+        Return a boolean mask over the events of this entity which is `True`
+        for all events matching the given condition (see `EventStore.match()`).
+        """
 
-        for key in range(ru.PROF_KEY_MAX - 1):
-            if needle[key] is not None:
-                if key == ru.MSG:
-                    if needle[key] not in hay[key]:
-                        return False
-                else:
-                    if needle[key] != hay[key]:
-                        return False
-        return True
+        return self._store.match(cond, *self._store.span(self._eid))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _get_index(self):
+        """
+        Lazily build an index of the positions of this entity's events, keyed
+        by event name code, by state code, and by both.  Positions are relative
+        to the entity's events and sorted (ie. time ordered).
+        """
+
+        cache = self._get_cache()
+        if 'index' not in cache:
+
+            store      = self._store
+            begin, end = store.span(self._eid)
+            events     = store.codes(ru.EVENT)[begin:end].tolist()
+            states     = store.codes(ru.STATE)[begin:end].tolist()
+
+            by_event = dict()
+            by_state = dict()
+            by_both  = dict()
+            for pos, (ev, st) in enumerate(zip(events, states)):
+                by_event.setdefault(ev, []).append(pos)
+                by_state.setdefault(st, []).append(pos)
+                by_both.setdefault((ev, st), []).append(pos)
+
+            cache['index'] = {ru.EVENT: by_event,
+                              ru.STATE: by_state,
+                              None    : by_both}
+
+        return cache['index']
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _positions(self, cond):
+        """
+        Return the sorted list of positions of all events of this entity which
+        match the given condition.  Conditions on event name and / or state are
+        looked up in the entity's event index, other condition fields are only
+        checked on the resulting candidates.
+        """
+
+        if len(cond) < ru.PROF_KEY_MAX or \
+                (cond[ru.EVENT] is None and cond[ru.STATE] is None):
+            # nothing to look up - scan all events
+            return np.flatnonzero(self._match(cond)).tolist()
+
+        store = self._store
+        index = self._get_index()
+
+        if cond[ru.STATE] is None:
+            pos = index[ru.EVENT].get(store.code(ru.EVENT, cond[ru.EVENT]))
+
+        elif cond[ru.EVENT] is None:
+            pos = index[ru.STATE].get(store.code(ru.STATE, cond[ru.STATE]))
+
+        else:
+            pos = index[None].get((store.code(ru.EVENT, cond[ru.EVENT]),
+                                   store.code(ru.STATE, cond[ru.STATE])))
+
+        if not pos:
+            return []
+
+        # check remaining condition fields on the candidate events
+        if cond[ru.TIME] is not None or cond[ru.COMP] is not None or \
+           cond[ru.TID]  is not None or cond[ru.UID]  is not None or \
+           cond[ru.MSG]  is not None:
+            rows = np.array(pos) + store.span(self._eid)[0]
+            mask = store.match(cond, rows=rows, skip=[ru.EVENT, ru.STATE])
+            pos  = [p for p, m in zip(pos, mask.tolist()) if m]
+
+        return pos
 
 
     # --------------------------------------------------------------------------
@@ -434,128 +557,61 @@ class Entity(object):
         if not state and not event:
             raise ValueError('duration needs state and/or event arguments')
 
-        event = self._ensure_tuplelist(event)
-
-        if not state: state = [[], []]
-        if not event: event = [[], []]
-
-        s_init  = state[0]
-        s_final = state[1]
-        e_init  = event[0]
-        e_final = event[1]
-
-        if not isinstance(s_init,  list): s_init  = [s_init ]
-        if not isinstance(s_final, list): s_final = [s_final]
-        if not isinstance(e_init,  list): e_init  = [e_init ]
-        if not isinstance(e_final, list): e_final = [e_final]
-
-        conds_init  = list()
-        conds_final = list()
-
-        for s in s_init:
-            et = ru.PROF_KEY_MAX * [None]
-            et[ru.STATE] = s
-            et[ru.EVENT] = 'state'
-            conds_init.append(tuple(et))
-
-        for s in s_final:
-            et = ru.PROF_KEY_MAX * [None]
-            et[ru.STATE] = s
-            et[ru.EVENT] = 'state'
-            conds_final.append(tuple(et))
-
-        for e in e_init:
-            if isinstance(e,dict):
-                et = ru.PROF_KEY_MAX * [None]
-                for k,v in list(e.items()):
-                    et[k] = v
-                conds_init.append(tuple(et))
-            else:
-                conds_init.append(e)
-
-      # t_start = sys.float_info.max
-      # for e in e_init:
-      #     for e_info in self._events:
-      #         if self._match_event(e, e_info):
-      #             t_start = min(t_start, e_info[ru.TIME])
-      #
-      # t_stop  = sys.float_info.min
-      # for e in e_final:
-      #     for e_info in self._events:
-      #         if self._match_event(e, e_info):
-      #             t_stop = max(t_stop, e_info[ru.TIME])
-      #
-      # if t_start == sys.float_info.max:
-      #   # return []
-      #     raise ValueError('initial condition did not apply')
-      #
-      # if t_stop == sys.float_info.min:
-      #   # return []
-      #     raise ValueError('final condition did not apply')
-      #
-      # if t_stop < t_start:
-      #   # return []
-      #     raise ValueError('duration uncovered time inconsistency')
-
-
-        for e in e_final:
-            if isinstance(e,dict):
-                et = ru.PROF_KEY_MAX * [None]
-                for k,v in list(e.items()):
-                    et[k] = v
-                conds_final.append(tuple(et))
-            else:
-                conds_final.append(e)
-
-        ranges     = list()
-        this_range = [None, None]
-
-        # NOTE: this assumes that `self.events` are time sorted
-        for e in self._events:
-            if this_range[0] is None:
-                # check for an initial event.
-                for c in conds_init:
-                    if self._match_event(c, e):
-                        this_range[0] = e[ru.TIME]
-                        break
-            else:
-                # check for a final event.  If found and '!expand`, then store
-                # the now completed event away, and start a new one; if
-                # `expand`, then keep searching for a later final event
-                for c in conds_final:
-                    if self._match_event(c, e):
-                        this_range[1] = e[ru.TIME]
-                        if not expand:
-                            ranges.append(this_range)
-                            this_range = [None, None]
-                            break
-
-        # we went through all events.  `this_range` may or may not be a usable
-        # range here.  If it is, append it to ranges.
-        if  this_range[0] is not None and \
-            this_range[1] is not None     :
-            ranges.append(this_range)
+        conds_init, conds_final = range_conditions(state, event)
+
+        # positions of all events which match any initial or final condition
+        inits  = set()
+        finals = set()
+        for c in conds_init : inits.update(self._positions(c))
+        for c in conds_final: finals.update(self._positions(c))
+        inits  = sorted(inits)
+        finals = sorted(finals)
+        times  = self._get_times()
+        ranges = list()
+
+        # NOTE: this assumes that the events are time sorted.  A range starts
+        #       at the next initial event, and ends at the next final event
+        #       after that (or the last final event if `expand` is set).  The
+        #       search for the next initial event resumes after that final
+        #       event.
+        pos = 0
+        while True:
+
+            i = bisect.bisect_left(inits, pos)
+            if i == len(inits):
+                break
+
+            start = inits[i]
+            j     = bisect.bisect_right(finals, start)
+            if j == len(finals):
+                break
+
+            if expand:
+                ranges.append([times[start], times[finals[-1]]])
+                break
+
+            stop = finals[j]
+            ranges.append([times[start], times[stop]])
+            pos  = stop + 1
 
         # apply time filter, if specified
         # For all ranges, check if they fall completely or partially within any
         # of the given time filters.  If not, drop that range, if yes, include
         # the overlapping part.
-        if not time or not len(time):
+        if not time or not len(time) or not ranges:
             ret = ranges
 
         else:
-            ret = list()
             if not isinstance(time[0], list):
                 time = [time]
 
-            # for each range in ret, we make  sure that it does not violate any
-            # time filter
-            for erange in ranges:
-                for trange in time:
-                    new_start = max(trange[0], erange[0])
-                    new_stop  = min(trange[1], erange[1])
-                    if new_stop > new_start:
-                        ret.append([new_start, new_stop])
+            # clip all ranges against all time filters at once
+            time   = np.asarray(time,   dtype=np.float64).reshape(-1, 2)
+            ranges = np.asarray(ranges, dtype=np.float64)
+            starts = np.maximum(ranges[:, 0, None], time[None, :, 0])
+            stops  = np.minimum(ranges[:, 1, None], time[None, :, 1])
+            keep   = stops > starts
+            ret    = np.stack((starts[keep], stops[keep]), axis=1).tolist()
 
         if collapse:
             ret = ru.collapse_ranges(ret)
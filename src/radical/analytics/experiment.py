@@ -1,9 +1,276 @@
 
-from .session import Session
+import os
+import collections
+
+import numpy  as np
+import pandas as pd
+
+import concurrent.futures as cf
+
+from collections.abc import Sequence
+
+import radical.utils as ru
+
+from .run     import Run
+from .memo    import freeze
+from .session import Session, _utilization_stats
 
 from typing import List, Union
 
 
+# the sessions loaded by a worker process, by source path and session type
+# (see `_get_session()`)
+_pool_sessions = dict()
+
+
+# ------------------------------------------------------------------------------
+#
+def _init_worker():
+    '''
+    Sessions are created in parallel already, so worker processes parse their
+    session profiles sequentially (see `ingest.read_profiles()`).
+    '''
+
+    os.environ['RADICAL_ANALYTICS_NPROC'] = '1'
+
+
+# ------------------------------------------------------------------------------
+#
+def _get_session(handle):
+    '''
+    Return the session for a handle passed to a worker process (see
+    `Experiment._get_handle()`): either a session, or the source path and
+    type of an unmodified session.  The latter is loaded from the session
+    cache, once per worker process.
+    '''
+
+    if isinstance(handle, Session):
+        return handle
+
+    if handle not in _pool_sessions:
+        src, stype = handle
+        _pool_sessions[handle] = Session.create(src=src, stype=stype)
+
+    return _pool_sessions[handle]
+
+
+# ------------------------------------------------------------------------------
+#
+def _create_session(src, stype, lazy=False):
+    '''
+    Create (or load the cached) session for `src` - this runs in the worker
+    processes of `Experiment`.  For `lazy` experiments, only the session
+    uid is returned: the session is loaded from the cache again on access.
+    '''
+
+    session = Session.create(src=src, stype=stype)
+
+    if lazy:
+        return session.uid
+
+    return session
+
+
+# ------------------------------------------------------------------------------
+#
+def _get_state(session):
+    '''
+    Return a key for the state of a session, which changes whenever the
+    session is filtered in place or its event times are shifted (see
+    `Session._changed()`).  `tzero` is part of the key, as it is shared with
+    all views on the session.
+    '''
+
+    return session._generation, session._store.tzero
+
+
+# the state of sessions which are freshly loaded from the session cache
+_PRISTINE = (0, 0.0)
+
+
+# ------------------------------------------------------------------------------
+#
+def _get_resources(session, rtype, udurations):
+    '''
+    Return the resources provided to and consumed by the entities of the given
+    session (see `Session._get_resources()`), and its number of tasks.
+    '''
+
+    provided, consumed = session._get_resources(rtype, udurations)
+
+    return provided, consumed, len(session.get(etype='task'))
+
+
+# ------------------------------------------------------------------------------
+#
+def _get_pool_resources(handle, rtype, udurations):
+    '''
+    Same as `_get_resources()`, for the session with the given handle (see
+    `_get_session()`) - this runs in the worker processes of `Experiment`.
+    '''
+
+    return _get_resources(_get_session(handle), rtype, udurations)
+
+
+# ------------------------------------------------------------------------------
+#
+def _query(session, query, etype, kwargs):
+    '''
+    Run a query on the entities of type `etype` (all entities if `None`) of
+    the given session, and return the result as a dict of numpy arrays (see
+    `Experiment._query()`).
+    '''
+
+    if etype is not None:
+        session = session.filter(etype=etype, inplace=False)
+
+    if query == 'get':
+        # only the uids are needed, so entities are not created
+        uids = session._apply_filter(**kwargs)
+        return {'uid': np.array(uids, dtype=object)}
+
+    if query == 'ranges':
+        starts, stops = session.ranges(as_array=True, **kwargs)
+        return {'start': starts, 'stop': stops}
+
+    if query == 'timestamps':
+        times = session.timestamps(**kwargs)
+        return {'time': np.asarray(times, dtype=np.float64)}
+
+    if query == 'concurrency':
+        times, values = session.concurrency(as_array=True, **kwargs)
+        return {'time': times, 'value': values}
+
+    if query == 'durations':
+        ret = {'uid': np.array(list(session._entities), dtype=object)}
+        ret.update(session.durations(**kwargs))
+        return ret
+
+    raise ValueError('unknown query %s' % query)
+
+
+# ------------------------------------------------------------------------------
+#
+def _pool_query(handle, query, etype, kwargs):
+    '''
+    Same as `_query()`, for the session with the given handle (see
+    `_get_session()`) - this runs in the worker processes of `Experiment`.
+    '''
+
+    return _query(_get_session(handle), query, etype, kwargs)
+
+
+# ------------------------------------------------------------------------------
+#
+class _LazySessions(Sequence):
+    '''
+    The sessions of a lazy `Experiment`: sessions are loaded from the session
+    cache when accessed (and re-created if their cache entry got evicted).
+    Whenever the estimated memory used by the loaded sessions exceeds `budget`
+    bytes, the least recently used sessions are dropped - they can be loaded
+    again from their snapshots.  Sessions which were filtered in place or
+    shifted in time differ from their snapshots and are never dropped.  The
+    memory used by a session is estimated by the size of its event store.
+    '''
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, srcs, sids, stype, budget):
+
+        self._srcs   = srcs
+        self._sids   = sids
+        self._stype  = stype
+        self._budget = budget
+        self._loaded = collections.OrderedDict()
+        self._nbytes = 0
+
+
+    # --------------------------------------------------------------------------
+    #
+    @property
+    def sids(self):
+        return list(self._sids)
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @property
+    def nbytes(self):
+        '''
+        Return the estimated memory used by the currently loaded sessions.
+        '''
+        return self._nbytes
+
+    @property
+    def loaded(self):
+        '''
+        Return the indexes of the currently loaded sessions, least recently
+        used first.
+        '''
+        return list(self._loaded)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get_state(self, idx):
+        '''
+        Return the state key of the session with the given index (see
+        `_get_state()`) without loading it: sessions which are not loaded are
+        loaded from the session cache on access, and are thus pristine.
+        '''
+
+        if idx in self._loaded:
+            return _get_state(self._loaded[idx][0])
+
+        return _PRISTINE
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __len__(self):
+
+        return len(self._srcs)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __getitem__(self, idx):
+
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        if idx < 0:
+            idx += len(self)
+
+        if not 0 <= idx < len(self):
+            raise IndexError('session index out of range')
+
+        if idx in self._loaded:
+            self._loaded.move_to_end(idx)
+            return self._loaded[idx][0]
+
+        session = Session.create(src=self._srcs[idx], stype=self._stype)
+        nbytes  = session._store.nbytes
+
+        self._loaded[idx] = (session, nbytes)
+        self._nbytes     += nbytes
+
+        # never drop changed sessions, nor the session we just loaded
+        for old in list(self._loaded):
+
+            if self._nbytes <= self._budget:
+                break
+
+            if old == idx or _get_state(self._loaded[old][0]) != _PRISTINE:
+                continue
+
+            _, nbytes     = self._loaded.pop(old)
+            self._nbytes -= nbytes
+
+        return session
+
+
 # ------------------------------------------------------------------------------
 #
 class Experiment(object):
@@ -11,7 +278,10 @@ class Experiment(object):
     # --------------------------------------------------------------------------
     #
     def __init__(self, sessions: List[Union[str, Session]],
-                       stype: str = None):
+                       stype: str = None,
+                       workers: int = None,
+                       lazy: bool = False,
+                       budget: int = None):
         '''
         This class represents an RCT experiment, i.e., a series of RA sessions
         which are collectively analyzed.
@@ -23,15 +293,34 @@ class Experiment(object):
 
         The session type `stype` will be uniformely applied when reading session
         data from provided paths.
-        '''
 
-        # FIXME: this is missing an abstraction: `Run`: a collection of sessions
-        #         which share the same parameters and thus can be statistically
-        #         handled together (means, std-deviation, etc).  Right now we
-        #         only use this `Experiment` abstraction for non-statistical
-        #         analysis (event plots, utilization plots, etc.)
+        If `workers` is set to more than one, sessions are created from their
+        source paths in a pool of that many processes.  Either way, progress
+        is reported as sessions are created, and sessions which cannot be
+        created are reported and skipped (see `errors`) - the remaining
+        sessions retain their order.  A `RuntimeError` is raised if none of
+        the sessions can be created.
+
+        If `lazy` is set, sessions are not kept in memory: they are stored in
+        the session cache on construction, and are loaded from there when
+        accessed (via `sessions`).  Loaded sessions are dropped again, least
+        recently used first, when their estimated memory use exceeds `budget`
+        bytes - except for sessions which were filtered in place or shifted in
+        time.  The budget defaults to `$RADICAL_ANALYTICS_MEMORY_BUDGET`, or
+        to 8 GB if that is not set.  Lazy experiments require session source
+        paths.
+
+        Sessions which share the same parameters can be grouped into runs for
+        statistical analysis (see `runs()`).
+        '''
 
-        self._sessions = list()
+        self._sessions  = list()
+        self._srcs      = list()
+        self._stype     = stype
+        self._errors    = dict()
+        self._workers   = workers
+        self._resources = dict()
+        self._rep       = ru.Reporter('radical.analytics')
 
         if not sessions:
             raise ValueError('cannot create experiments w/o sessions')
@@ -39,12 +328,21 @@ class Experiment(object):
         if isinstance(sessions[0], str):
             for src in sessions:
                 assert isinstance(src, str)
-                self._sessions.append(Session.create(src=src, stype=stype))
+
+            if lazy and budget is None:
+                budget = int(os.environ.get('RADICAL_ANALYTICS_MEMORY_BUDGET',
+                                            8 * 1024 ** 3))
+
+            self._create_sessions(sessions, stype, workers, lazy, budget)
+
+        elif lazy:
+            raise ValueError('lazy experiments need session source paths')
 
         else:
             for session in sessions:
                 assert isinstance(session, Session)
                 self._sessions.append(session)
+                self._srcs.append(None)
 
 
     # --------------------------------------------------------------------------
@@ -55,12 +353,241 @@ class Experiment(object):
 
     @property
     def sids(self):
-        return [s.sid for s in self._sessions]
+        if isinstance(self._sessions, _LazySessions):
+            return self._sessions.sids
+        return [s.uid for s in self._sessions]
+
+    @property
+    def errors(self):
+        '''
+        Return a dict of the source paths of all sessions which could not be
+        created, and the respective exceptions.
+        '''
+        return self._errors
+
+
+    # --------------------------------------------------------------------------
+    #
+    def runs(self, key):
+        '''
+        Group the sessions of this experiment into runs, i.e., collections of
+        sessions which share the same parameters and can thus be statistically
+        handled together (see `Run`).  `key` is either a callable which returns
+        the run key for a given session, or a dict which maps session ids to
+        run keys (sessions not in that dict are ignored).
+
+        Returns a dict of `Run` instances, keyed by run key, in the order in
+        which the keys first occur.  Within runs, sessions retain their order.
+
+        Example::
+
+            runs = exp.runs(lambda s: len(s.get(etype='pilot')))
+            for n_pilots, run in runs.items():
+                print(n_pilots, run.stats(run.ttc()))
+        '''
+
+        sids   = self.sids
+        groups = dict()
+        for idx, sid in enumerate(sids):
+
+            if callable(key) : value = key(self._sessions[idx])
+            elif sid in key  : value = key[sid]
+            else             : continue
+
+            groups.setdefault(value, list()).append(idx)
+
+        return {value: Run(value, self, idxs)
+                for value, idxs in groups.items()}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _query(self, query, etype, workers, kwargs):
+        '''
+        Run the given session query (with the given `kwargs`) on all sessions
+        of this experiment, in a pool of `workers` processes (defaults to the
+        `workers` the experiment was created with), and combine the results
+        into a single data frame.  The first column (`sid`) labels the rows
+        with their session ids, the other columns are those returned by the
+        module level `_query()`.
+        '''
+
+        if workers is None:
+            workers = self._workers
+
+        sids    = self.sids
+        results = dict()
+
+        if not workers or workers < 2 or len(sids) < 2:
+            for idx in range(len(sids)):
+                results[idx] = _query(self._sessions[idx], query, etype,
+                                      kwargs)
+
+        else:
+            with cf.ProcessPoolExecutor(max_workers=min(workers, len(sids)),
+                                        initializer=_init_worker) as pool:
+                futures = {pool.submit(_pool_query, self._get_handle(idx),
+                                       query, etype, kwargs): idx
+                           for idx in range(len(sids))}
+                for future in cf.as_completed(futures):
+                    results[futures[future]] = future.result()
+
+        results = [results[idx] for idx in range(len(sids))]
+        lengths = [len(next(iter(result.values()))) for result in results]
+
+        ret = {'sid': np.repeat(np.array(sids, dtype=object), lengths)}
+        for col in results[0]:
+            ret[col] = np.concatenate([result[col] for result in results])
+
+        return pd.DataFrame(ret)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get(self, etype=None, uid=None, name=None, state=None, event=None,
+                  time=None, workers=None):
+        '''
+        Run `Session.get()` on all sessions of this experiment (see
+        `_query()` for `workers`), and return a data frame with the columns
+        `sid` and `uid` for all matching entities.  The entities themselves
+        are not created.
+        '''
+
+        return self._query('get', None, workers,
+                           {'etype': etype, 'uid'  : uid,   'name': name,
+                            'state': state, 'event': event, 'time': time})
+
+
+    # --------------------------------------------------------------------------
+    #
+    def ranges(self, state=None, event=None, time=None, collapse=True,
+                     etype=None, workers=None):
+        '''
+        Run `Session.ranges()` on the entities of type `etype` (all entities
+        if not set) of all sessions of this experiment (see `_query()` for
+        `workers`), and return a data frame with the columns `sid`, `start`
+        and `stop`.
+
+        Example::
+
+            ranges = exp.ranges(event=[{ru.EVENT: 'exec_start'},
+                                       {ru.EVENT: 'exec_stop' }],
+                                collapse=False, etype='task')
+            print((ranges.stop - ranges.start).quantile(0.95))
+        '''
+
+        return self._query('ranges', etype, workers,
+                           {'state': state, 'event'   : event,
+                            'time' : time,  'collapse': collapse})
+
+
+    # --------------------------------------------------------------------------
+    #
+    def timestamps(self, state=None, event=None, time=None, first=False,
+                         etype=None, workers=None):
+        '''
+        Run `Session.timestamps()` on the entities of type `etype` (all
+        entities if not set) of all sessions of this experiment (see
+        `_query()` for `workers`), and return a data frame with the columns
+        `sid` and `time`.
+        '''
+
+        return self._query('timestamps', etype, workers,
+                           {'state': state, 'event': event,
+                            'time' : time,  'first': first})
+
+
+    # --------------------------------------------------------------------------
+    #
+    def concurrency(self, state=None, event=None, time=None, sampling=None,
+                          etype=None, workers=None):
+        '''
+        Run `Session.concurrency()` on the entities of type `etype` (all
+        entities if not set) of all sessions of this experiment (see
+        `_query()` for `workers`), and return a data frame with the columns
+        `sid`, `time` and `value`.
+        '''
+
+        return self._query('concurrency', etype, workers,
+                           {'state': state, 'event'   : event,
+                            'time' : time,  'sampling': sampling})
+
+
+    # --------------------------------------------------------------------------
+    #
+    def durations(self, specs, time=None, etype=None, workers=None):
+        '''
+        Run `Session.durations()` on the entities of type `etype` (all entities
+        if not set) of all sessions of this experiment (see `_query()` for
+        `workers`), and return a data frame with the columns `sid`, `uid`, and
+        one column per duration definition in `specs`.  Undefined durations
+        are `NaN`.
+        '''
+
+        return self._query('durations', etype, workers,
+                           {'specs': specs, 'time': time})
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _create_sessions(self, srcs, stype, workers, lazy=False, budget=None):
+        '''
+        Create the sessions for the given source paths, in a process pool of
+        `workers` processes if that is larger than one.  Progress is reported
+        as sessions are created.  For `lazy` experiments, the sessions are
+        only stored in the session cache (see `_LazySessions`).
+        '''
+
+        results = dict()
+
+        def _done(idx, session=None, error=None):
+
+            if error is None: results[idx]            = session
+            else            : self._errors[srcs[idx]] = error
+
+            self._rep.info('[%d/%d] %s' % (len(results) + len(self._errors),
+                                           len(srcs), srcs[idx]))
+            if error is None: self._rep.ok('>>ok\n')
+            else            : self._rep.error('>>%s\n' % error)
+
+        self._rep.header('creating %d sessions' % len(srcs))
+
+        if not workers or workers < 2 or len(srcs) < 2:
+            for idx, src in enumerate(srcs):
+                try:
+                    _done(idx, session=_create_session(src, stype, lazy))
+                except Exception as e:
+                    _done(idx, error=e)
+
+        else:
+            with cf.ProcessPoolExecutor(max_workers=min(workers, len(srcs)),
+                                        initializer=_init_worker) as pool:
+                futures = {pool.submit(_create_session, src, stype, lazy): idx
+                           for idx, src in enumerate(srcs)}
+                for future in cf.as_completed(futures):
+                    try:
+                        _done(futures[future], session=future.result())
+                    except Exception as e:
+                        _done(futures[future], error=e)
+
+        if not results:
+            raise RuntimeError('cannot create any session: %s'
+                               % list(self._errors.items()))
+
+        idxs = sorted(results)
+        self._srcs = [srcs[idx] for idx in idxs]
+        if lazy:
+            self._sessions = _LazySessions([srcs[idx]    for idx in idxs],
+                                           [results[idx] for idx in idxs],
+                                           stype, budget)
+        else:
+            self._sessions = [results[idx] for idx in idxs]
 
 
     # --------------------------------------------------------------------------
     #
-    def utilization(self, metrics, rtype='cpu', udurations=None):
+    def utilization(self, metrics, rtype='cpu', udurations=None,
+                          workers=None):
         '''
         return five dictionaries:
           - provided resources
@@ -111,21 +638,118 @@ class Experiment(object):
         session type: only RP sessions are supported at the moment where those
         resource values are indexes in to the list of cores used in that
         specific session (offset over multiple pilots, if needed).
+
+        The resources of the sessions are computed in a pool of `workers`
+        processes (defaults to the `workers` the experiment was created with).
+        They are cached per session, `rtype` and `udurations`: calling this
+        method again with different `metrics` only recomputes the stats (as
+        long as the sessions are not filtered in place, and their `tzero` does
+        not change).
         '''
 
         # FIXME: the data structure documented above is not yet implemented
 
+        return self._get_utilization(range(len(self._sessions)), metrics,
+                                     rtype, udurations, workers)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _get_state(self, idx):
+        '''
+        Return the state key of the session with the given index (see
+        `_get_state()`), without loading lazy sessions.
+        '''
+
+        if isinstance(self._sessions, _LazySessions):
+            return self._sessions.get_state(idx)
+
+        return _get_state(self._sessions[idx])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _get_handle(self, idx):
+        '''
+        Return what a worker process needs to obtain the session with the
+        given index (see `_get_session()`).  Sessions which were created from
+        a source path and did not change since are loaded by the workers from
+        the session cache, and are thus not passed on to them.  Other sessions
+        are passed on as a whole.
+        '''
+
+        if self._srcs[idx] is not None and self._get_state(idx) == _PRISTINE:
+            return self._srcs[idx], self._stype
+
+        return self._sessions[idx]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _get_utilization(self, idxs, metrics, rtype, udurations, workers):
+        '''
+        Same as `utilization()`, for the sessions with the given indexes.  The
+        resources of the sessions are cached per `rtype` and `udurations`,
+        together with the state of the session they were computed for (see
+        `_get_state()`): when a session is filtered in place or its `tzero`
+        changes, its resources are computed again.
+        '''
+
         provided  = dict()
         consumed  = dict()
         stats_abs = dict()
         stats_rel = dict()
         info      = dict()
 
-        # obtain resources provisions and consumptions for all sessions
-        for session in self._sessions:
+        if workers is None:
+            workers = self._workers
+
+        # resources are not cached for `udurations` which cannot be used as
+        # cache key
+        try:
+            ukey      = freeze(udurations)
+            cacheable = True
+        except TypeError:
+            cacheable = False
+
+        sids      = self.sids
+        states    = {idx: self._get_state(idx) for idx in idxs}
+        resources = dict()
+        if cacheable:
+            for idx in idxs:
+                state, res = self._resources.get((idx, rtype, ukey),
+                                                 (None, None))
+                if state == states[idx]:
+                    resources[idx] = res
+
+        # obtain resources provisions and consumptions for all other sessions
+        missing = [idx for idx in idxs if idx not in resources]
+
+        if not workers or workers < 2 or len(missing) < 2:
+            for idx in missing:
+                resources[idx] = _get_resources(self._sessions[idx], rtype,
+                                                udurations)
 
-            sid = session.uid
-            p, c, sa, sr, i = session.utilization(metrics, rtype, udurations)
+        else:
+            with cf.ProcessPoolExecutor(max_workers=min(workers, len(missing)),
+                                        initializer=_init_worker) as pool:
+                futures = {pool.submit(_get_pool_resources,
+                                       self._get_handle(idx), rtype,
+                                       udurations): idx
+                           for idx in missing}
+                for future in cf.as_completed(futures):
+                    resources[futures[future]] = future.result()
+
+        if cacheable:
+            for idx in missing:
+                self._resources[(idx, rtype, ukey)] = (states[idx],
+                                                       resources[idx])
+
+        for idx in idxs:
+
+            sid           = sids[idx]
+            p, c, n_tasks = resources[idx]
+            sa, sr, i     = _utilization_stats(sid, n_tasks, p, c, metrics)
 
             provided [sid] = p
             consumed [sid] = c
@@ -0,0 +1,384 @@
+
+import io
+import os
+import csv
+import heapq
+import queue
+import tarfile
+import threading
+
+import concurrent.futures as cf
+
+import radical.utils as ru
+
+from .store import EventStore, encode, merge
+
+
+# profiles are parsed in a process pool if their total size exceeds this
+# threshold (bytes) - below that, the pool startup costs outweigh its benefits
+_PARALLEL_MIN_SIZE = 16 * 1024 * 1024
+
+# clock sync events (see `ru.combine_profiles()`)
+_SYNC_EVENTS = ['sync_abs', 'sync_rel']
+
+# maximum number of decompressed tarball members waiting to be parsed
+_QUEUE_SIZE = 16
+
+
+# ------------------------------------------------------------------------------
+#
+def find_profiles(src):
+    '''
+    Return the sorted list of all profiles (`*.prof` files) in the directory
+    tree `src`.
+    '''
+
+    ret   = list()
+    paths = [src]
+    while paths:
+        with os.scandir(paths.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    paths.append(entry.path)
+                elif entry.name.endswith('.prof'):
+                    ret.append(entry.path)
+
+    return sorted(ret)
+
+
+# ------------------------------------------------------------------------------
+#
+def get_shards(paths, n_shards):
+    '''
+    Split the given files into (at most) `n_shards` shards of about the same
+    total file size.  Each file is assigned to the currently smallest shard,
+    largest files first, so the first shards are the largest ones.  The files
+    of each shard retain their order.
+    '''
+
+    sizes  = {path: os.path.getsize(path) for path in paths}
+    shards = [(0, idx, list()) for idx in range(min(n_shards, len(paths)))]
+
+    for path in sorted(paths, key=lambda p: sizes[p], reverse=True):
+        size, idx, shard = heapq.heappop(shards)
+        shard.append(path)
+        heapq.heappush(shards, (size + sizes[path], idx, shard))
+
+    order = {path: idx for idx, path in enumerate(paths)}
+    return [sorted(shard, key=lambda p: order[p])
+            for _, _, shard in sorted(shards, key=lambda x: x[1]) if shard]
+
+
+# ------------------------------------------------------------------------------
+#
+def parse_profile(lines, pname, sid):
+    '''
+    Parse the lines of a profile (any iterable of strings, such as an open
+    file) into a list of events.  This follows `ru.read_profiles()`, but can
+    be used on streams (eg. on tarball members) as well as on files.
+    '''
+
+    legacy = os.environ.get('RADICAL_ANALYTICS_LEGACY_PROFILES', '')
+    legacy = bool(legacy) and legacy.lower() not in ['no', 'false']
+
+    csv.field_size_limit(ru.profile.CSV_FIELD_SIZE_LIMIT)
+
+    ret  = list()
+    last = None
+    for raw in csv.reader(lines):
+
+        # we keep the raw data around for error checks
+        row = list(raw)
+
+        # skip header
+        if row[ru.TIME].startswith('#'):
+            continue
+
+        # make room in the row for entity type etc.
+        row.extend([None] * (ru.PROF_KEY_MAX - len(row)))
+        row[ru.TIME] = float(row[ru.TIME])
+
+        # we derive entity type from the uid -- but funnel some cases into
+        # 'session' as a catch-all type
+        if row[ru.UID]:
+            row[ru.ENTITY] = row[ru.UID].split('.', 1)[0]
+        else:
+            row[ru.ENTITY] = 'session'
+            row[ru.UID]    = sid
+
+        # we should have no unset (ie. None) fields left - otherwise the
+        # profile was likely not correctly closed.
+        if None in row and legacy:
+            comp, tid = row[1].split(':', 1)
+            new_row   = [None] * ru.PROF_KEY_MAX
+            new_row[ru.TIME ] = row[0]
+            new_row[ru.EVENT] = row[4]
+            new_row[ru.COMP ] = comp
+            new_row[ru.TID  ] = tid
+            new_row[ru.UID  ] = row[2]
+            new_row[ru.STATE] = row[3]
+            new_row[ru.MSG  ] = row[5]
+
+            if new_row[ru.UID]:
+                new_row[ru.ENTITY] = new_row[ru.UID].split('.', 1)[0]
+            else:
+                new_row[ru.ENTITY] = 'session'
+                new_row[ru.UID]    = sid
+
+            row = new_row
+
+        if None in row:
+            print('row invalid [%s]: %s' % (pname, raw))
+            continue
+
+        # fix rp issue 1117 (see `ru.read_profiles()`)
+        if row[ru.TIME] == 1.0 and last:
+            row[ru.TIME] = last[ru.TIME]
+
+        ret.append(row)
+        last = row
+
+    return ret
+
+
+# ------------------------------------------------------------------------------
+#
+def _encode_profile(pname, prof):
+    '''
+    Return a tuple of the profile name, its clock sync events, and the encoded
+    profile (see `store.encode()`).
+    '''
+
+    syncs = [row for row in prof if row[ru.EVENT] in _SYNC_EVENTS]
+
+    return pname, syncs, encode(prof)
+
+
+# ------------------------------------------------------------------------------
+#
+def read_shard(paths, sid):
+    '''
+    Parse and encode the given profiles (see `_encode_profile()`).
+    '''
+
+    ret = list()
+    for path in paths:
+        with ru.ru_open(path, 'r') as fin:
+            ret.append(_encode_profile(path, parse_profile(fin, path, sid)))
+
+    return ret
+
+
+# ------------------------------------------------------------------------------
+#
+def read_member(name, data, sid):
+    '''
+    Parse and encode a profile given as bytes (see `_encode_profile()`).
+    '''
+
+    lines = io.StringIO(data.decode('utf8'), newline=None)
+
+    return _encode_profile(name, parse_profile(lines, name, sid))
+
+
+# ------------------------------------------------------------------------------
+#
+def _get_nproc(nproc=None):
+    '''
+    Return `nproc`, or `$RADICAL_ANALYTICS_NPROC`, or the number of usable CPU
+    cores if neither is set.
+    '''
+
+    if nproc:
+        return nproc
+
+    nproc = os.environ.get('RADICAL_ANALYTICS_NPROC')
+    if nproc:
+        return int(nproc)
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# ------------------------------------------------------------------------------
+#
+def _combine(parts):
+    '''
+    Merge the encoded profiles `parts` (see `_encode_profile()`) into an event
+    store, with event times corrected for clock offsets between profiles as
+    done by `ru.combine_profiles()`.  Returns a tuple of the event store and
+    the clock sync accuracy.
+    '''
+
+    # Determine the time correction for each profile by running
+    # `ru.combine_profiles()` on the clock sync events only, plus one probe
+    # event per profile at time `0.0` - the correction applied to the probe
+    # is the correction for that profile.  `combine_profiles()` may also
+    # transplant sync events between profiles: those are retained as
+    # additional events, just as in the combined profile.
+    probes  = list()
+    syncs   = dict()
+    for pname, sync, _ in parts:
+        probe = [0.0, 'probe'] + [''] * (ru.PROF_KEY_MAX - 2)
+        probes.append(probe)
+        syncs[pname] = sync + [probe]
+
+    lengths = {pname: len(sync) for pname, sync in syncs.items()}
+    _, accuracy = ru.combine_profiles(syncs)
+
+    shifts = [probe[ru.TIME] for probe in probes]
+    extra  = [row for pname, sync in syncs.items()
+                  for row  in sync[lengths[pname]:]]
+
+    if extra:
+        parts  = parts + [(None, None, encode(extra))]
+        shifts = shifts + [0.0]
+
+    store = EventStore.from_columns(*merge([part[2] for part in parts],
+                                           shifts))
+
+    return store, accuracy
+
+
+# ------------------------------------------------------------------------------
+#
+def read_profiles(paths, sid, nproc=None):
+    '''
+    Parse the given profiles into an `EventStore`, with event times corrected
+    for clock offsets between profiles as done by `ru.combine_profiles()`.
+
+    The profiles are split into size balanced shards which are parsed and
+    encoded in a pool of `nproc` processes (defaults to the number of usable
+    CPU cores).  Only the clock sync events of all profiles are merged
+    centrally, to determine the time correction for each profile.
+
+    Returns a tuple of the event store and the clock sync accuracy.
+    '''
+
+    nproc = _get_nproc(nproc)
+    size  = sum(os.path.getsize(path) for path in paths)
+
+    if nproc == 1 or len(paths) == 1 or size < _PARALLEL_MIN_SIZE:
+        parts = read_shard(paths, sid)
+
+    else:
+        shards = get_shards(paths, nproc)
+        with cf.ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [pool.submit(read_shard, shard, sid) for shard in shards]
+            results = dict()
+            for future in futures:
+                for part in future.result():
+                    results[part[0]] = part
+
+        # retain the profile order for ties in event times
+        parts = [results[path] for path in paths if path in results]
+
+    return _combine(parts)
+
+
+# ------------------------------------------------------------------------------
+#
+def _read_members(src, members, stop):
+    '''
+    Decompress all profiles in the tarball `src` and put them as tuples of
+    member name and content into the `members` queue, followed by `None`.
+    Errors are put into the queue as well.  Reading ends early once the
+    `stop` event is set.
+    '''
+
+    def _put(item):
+        # don't block on a full queue once the consumer is gone
+        while not stop.is_set():
+            try:
+                members.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        with tarfile.open(src, mode='r|*') as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith('.prof'):
+                    data = tar.extractfile(member).read()
+                    if not _put((member.name, data)):
+                        return
+
+    except Exception as e:
+        _put(e)
+
+    finally:
+        _put(None)
+
+
+# ------------------------------------------------------------------------------
+#
+def read_tarball(src, sid, nproc=None):
+    '''
+    Same as `read_profiles()`, but for all profiles in the session tarball
+    `src`.  The tarball is not extracted: its members are decompressed in
+    a separate thread, and their content is passed on to the parser as it
+    becomes available.
+    '''
+
+    nproc   = _get_nproc(nproc)
+    stop    = threading.Event()
+    members = queue.Queue(maxsize=_QUEUE_SIZE)
+    reader  = threading.Thread(target=_read_members,
+                               args=(src, members, stop), daemon=True)
+    reader.start()
+
+    # profiles compress well - assume a compression factor of 4 to decide
+    # whether parsing is worth a process pool
+    pool    = None
+    parts   = list()
+    pending = set()
+    if nproc > 1 and os.path.getsize(src) * 4 >= _PARALLEL_MIN_SIZE:
+        pool = cf.ProcessPoolExecutor(max_workers=nproc)
+
+    try:
+        while True:
+
+            item = members.get()
+            if item is None:
+                break
+
+            if isinstance(item, Exception):
+                raise RuntimeError('cannot read tarball %s' % src) from item
+
+            name, data = item
+            if not pool:
+                parts.append(read_member(name, data, sid))
+                continue
+
+            # limit the number of members held in memory by the pool
+            if len(pending) >= nproc + _QUEUE_SIZE:
+                done, pending = cf.wait(pending,
+                                        return_when=cf.FIRST_COMPLETED)
+                parts.extend([future.result() for future in done])
+
+            pending.add(pool.submit(read_member, name, data, sid))
+
+        parts.extend([future.result() for future in pending])
+
+    finally:
+        # release the reader if it is blocked on the full queue
+        stop.set()
+        while True:
+            try:
+                members.get_nowait()
+            except queue.Empty:
+                break
+        reader.join()
+
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    # use the same profile order as for extracted tarballs
+    return _combine(sorted(parts, key=lambda part: part[0]))
+
+
+# ------------------------------------------------------------------------------
+
@@ -0,0 +1,216 @@
+
+import inspect
+import functools
+import collections
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------------
+#
+def freeze(value):
+    '''
+    Convert a query argument into a hashable value which can be used as (part
+    of) a memo key.  Lists, tuples, dicts and sets are converted recursively,
+    and their type is retained as the query methods do treat, for example,
+    a tuple of time ranges differently from a list.  Raises a `TypeError` for
+    values which cannot be converted.
+    '''
+
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(freeze(v) for v in value))
+
+    if isinstance(value, dict):
+        return (dict, frozenset((k, freeze(v)) for k, v in value.items()))
+
+    if isinstance(value, (set, frozenset)):
+        return (frozenset, frozenset(freeze(v) for v in value))
+
+    if isinstance(value, np.ndarray):
+        return (np.ndarray, value.dtype.str, value.shape, value.tobytes())
+
+    # raises `TypeError` on unhashable values
+    hash(value)
+
+    return value
+
+
+# ------------------------------------------------------------------------------
+#
+def _copy(value):
+    '''
+    Return a copy of a memoized result which can be handed out to the caller:
+    containers and arrays are copied (lists of lists to the second level), so
+    that callers can modify the result without affecting the memo.  Entities
+    and other objects in the result are *not* copied.
+    '''
+
+    if isinstance(value, np.ndarray):
+        return value.copy()
+
+    if isinstance(value, list):
+        if value and isinstance(value[0], list):
+            return [list(v) for v in value]
+        return list(value)
+
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+
+    return value
+
+
+# ------------------------------------------------------------------------------
+#
+class Memo(object):
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, size=128):
+        '''
+        A bounded store of query results: whenever more than `size` results
+        are stored, the least recently used ones are dropped.  The memo also
+        keeps track of the `tzero` offset the results were computed with (see
+        `check()`).
+        '''
+
+        if size < 1:
+            raise ValueError('memo size must be positive (%s)' % size)
+
+        self._size   = size
+        self._data   = collections.OrderedDict()
+        self._tzero  = None
+        self._hits   = 0
+        self._misses = 0
+
+
+    # --------------------------------------------------------------------------
+    #
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __len__(self):
+        return len(self._data)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def check(self, tzero):
+        '''
+        Drop all results if they were computed with a different `tzero` offset.
+        Sessions share their event store (and thus tzero) with their views, so
+        that offset can change without the session noticing.
+        '''
+
+        if tzero != self._tzero:
+            self._data.clear()
+            self._tzero = tzero
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get(self, key):
+        '''
+        Return a tuple `(found, result)` for the given key, and mark the result
+        as recently used.
+        '''
+
+        if key not in self._data:
+            self._misses += 1
+            return False, None
+
+        self._hits += 1
+        self._data.move_to_end(key)
+
+        return True, self._data[key]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def put(self, key, result):
+
+        self._data[key] = result
+        self._data.move_to_end(key)
+
+        while len(self._data) > self._size:
+            self._data.popitem(last=False)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def clear(self):
+
+        self._data.clear()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def stats(self):
+        '''
+        Return hit / miss counters and the current number of stored results.
+        '''
+
+        return {'hits'    : self._hits,
+                'misses'  : self._misses,
+                'entries' : len(self._data),
+                'size'    : self._size}
+
+
+# ------------------------------------------------------------------------------
+#
+def memoized(method):
+    '''
+    Decorator for session query methods: if the session has a memo (see
+    `Session.memoize()`), results are looked up in that memo, keyed by the
+    method name and the normalized call arguments (positional and keyword
+    arguments, with defaults applied).  Calls with arguments which cannot be
+    used as key are not memoized.  Callers receive copies of the memoized
+    results.
+    '''
+
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+
+        memo = self._memo
+        if memo is None:
+            return method(self, *args, **kwargs)
+
+        try:
+            bound  = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            values = list(bound.arguments.values())[1:]   # skip `self`
+            key    = (method.__name__, freeze(values))
+
+        except TypeError:
+            return method(self, *args, **kwargs)
+
+        memo.check(self._store.tzero)
+
+        found, ret = memo.get(key)
+        if not found:
+            ret = method(self, *args, **kwargs)
+            memo.put(key, ret)
+
+        return _copy(ret)
+
+    return wrapper
+
+
+# ------------------------------------------------------------------------------
+
@@ -0,0 +1,258 @@
+
+import warnings
+
+import numpy as np
+
+from collections.abc import Sequence
+
+
+# ------------------------------------------------------------------------------
+#
+def _reduce(values):
+    '''
+    Reduce the rows of a 2D array to statistics, ignoring `NaN` values.
+    Returns a dict of arrays with one value per row.
+    '''
+
+    # rows without any defined values result in `NaN` (and a warning)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        return {'n'      : np.sum(~np.isnan(values), axis=1),
+                'mean'   : np.nanmean  (values, axis=1),
+                'std'    : np.nanstd   (values, axis=1),
+                'min'    : np.nanmin   (values, axis=1),
+                'max'    : np.nanmax   (values, axis=1),
+                'median' : np.nanmedian(values, axis=1)}
+
+
+# ------------------------------------------------------------------------------
+#
+def stats(values):
+    '''
+    Reduce per-session values (an array with one value per session) to
+    statistics over the sessions.  `NaN` values (sessions for which a value
+    is not defined) are ignored.  Returns a dict::
+
+        {
+          'n'      : <number of defined values>,
+          'mean'   : <mean>,
+          'std'    : <standard deviation>,
+          'min'    : <minimum>,
+          'max'    : <maximum>,
+          'median' : <median>
+        }
+
+    If `values` is a dict of such arrays (as returned by `Run.durations()`),
+    a dict with the statistics for each key is returned.  Those arrays are
+    reduced all at once.
+    '''
+
+    if isinstance(values, dict):
+        names   = list(values)
+        stacked = np.array([values[name] for name in names], dtype=np.float64)
+        reduced = _reduce(stacked.reshape(len(names), -1))
+
+        return {name: {k: v[idx].item() for k, v in reduced.items()}
+                for idx, name in enumerate(names)}
+
+    reduced = _reduce(np.asarray(values, dtype=np.float64).reshape(1, -1))
+
+    return {k: v[0].item() for k, v in reduced.items()}
+
+
+# ------------------------------------------------------------------------------
+#
+class _SessionSubset(Sequence):
+    '''
+    A subset of the sessions of an experiment, given by their indexes.  For
+    lazy experiments, sessions are only loaded on access.
+    '''
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, sessions, idxs):
+
+        self._sessions = sessions
+        self._idxs     = idxs
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __len__(self):
+
+        return len(self._idxs)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __getitem__(self, idx):
+
+        if isinstance(idx, slice):
+            return [self._sessions[i] for i in self._idxs[idx]]
+
+        return self._sessions[self._idxs[idx]]
+
+
+# ------------------------------------------------------------------------------
+#
+class Run(object):
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, key, experiment, idxs):
+        '''
+        A run is a collection of sessions which share the same parameters
+        (such as the same workload on the same resources), and can thus be
+        handled together for statistics.  Runs are created by
+        `Experiment.runs()`, and consist of the sessions of that `experiment`
+        with the given indexes.
+
+        The methods of a run compute one value per session, and return them
+        as numpy arrays (in session order) which can be reduced to statistics
+        over the sessions via `stats()`.  Values which are not defined for
+        a session are `NaN`.
+        '''
+
+        self._key        = key
+        self._experiment = experiment
+        self._idxs       = list(idxs)
+        self._sessions   = _SessionSubset(experiment.sessions, self._idxs)
+
+
+    # --------------------------------------------------------------------------
+    #
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def sessions(self):
+        return self._sessions
+
+    @property
+    def sids(self):
+        sids = self._experiment.sids
+        return [sids[idx] for idx in self._idxs]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __len__(self):
+        return len(self._sessions)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _select(self, session, etype):
+
+        if etype is None:
+            return session
+
+        return session.filter(etype=etype, inplace=False)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def ttc(self):
+        '''
+        Return the time to completion of each session.
+        '''
+
+        return np.array([s.ttc for s in self._sessions], dtype=np.float64)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def durations(self, specs, etype='task', time=None, reduce=np.nanmean):
+        '''
+        Compute the durations of all entities of type `etype` in each session
+        (see `Session.durations()`), and reduce them per session with the
+        `reduce` function (the mean by default).
+
+        Returns a dict with the keys of `specs`, where each value is an array
+        with the reduced durations per session.  The durations of all sessions
+        are stacked (padded with `NaN`) and reduced at once, so `reduce` needs
+        to accept an `axis` parameter, and to ignore `NaN` values.
+        '''
+
+        values = {name: list() for name in specs}
+        for session in self._sessions:
+            durations = self._select(session, etype).durations(specs, time)
+            for name in specs:
+                values[name].append(durations[name])
+
+        # stack the per-session durations into a `[session, entity]` array
+        ret = dict()
+        for name, arrays in values.items():
+
+            width   = max([len(a) for a in arrays] + [1])
+            stacked = np.full((len(arrays), width), np.nan)
+            for idx, array in enumerate(arrays):
+                stacked[idx, :len(array)] = array
+
+            defined   = ~np.isnan(stacked).all(axis=1)
+            ret[name] = np.full(len(arrays), np.nan)
+            if defined.any():
+                ret[name][defined] = reduce(stacked[defined], axis=1)
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def peaks(self, state=None, event=None, etype='task', time=None):
+        '''
+        Return the peak concurrency of the entities of type `etype` in each
+        session (see `Session.concurrency()`), or `NaN` for sessions without
+        any matching ranges.
+        '''
+
+        ret = np.full(len(self._sessions), np.nan)
+        for idx, session in enumerate(self._sessions):
+            _, values = self._select(session, etype).concurrency(
+                                      state=state, event=event, time=time,
+                                      as_array=True)
+            if len(values):
+                ret[idx] = values.max()
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def utilization(self, metrics, rtype='cpu', udurations=None,
+                          workers=None):
+        '''
+        Return the relative resource utilization (in percent) of each session
+        (see `Experiment.utilization()`, which also documents `workers`), as
+        a dict which maps the metric names (and `total`) to arrays of
+        per-session values.
+        '''
+
+        _, _, _, stats_rel, _ = self._experiment._get_utilization(
+                self._idxs, metrics, rtype, udurations, workers)
+
+        ret = dict()
+        for idx, sid in enumerate(self.sids):
+            for name, value in stats_rel[sid].items():
+                if name not in ret:
+                    ret[name] = np.full(len(self._idxs), np.nan)
+                ret[name][idx] = value
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def stats(self, values):
+        '''
+        Reduce per-session values to statistics over the sessions of this run
+        (see `stats()`).
+        '''
+
+        return stats(values)
+
+
+# ------------------------------------------------------------------------------
+
@@ -2,16 +2,35 @@
 
 import re
 import os
-import sys
 import copy
+import json
+import pickle
 import tarfile
+import itertools
 
-import pickle as pickle
+from collections.abc import Mapping
 
+import numpy          as np
 import more_itertools as mit
 import radical.utils  as ru
 
-from .entity import Entity
+from .entity import Entity, get_etype
+from .memo   import Memo, memoized
+from .store  import EventStore, as_conditions, state_condition, in_ranges
+from .store  import range_conditions
+
+from . import compute
+from . import ingest
+from . import cache as _cache
+
+
+# details of entities for which the session description has no information
+# (shared by all such entities, and never modified)
+_NO_DETAILS = dict()
+
+# generations of changed sessions (see `Session._changed()`) are unique within
+# the process, so that they also tell apart different instances of a session
+_generations = itertools.count(1)
 
 
 # ------------------------------------------------------------------------------
@@ -27,8 +46,10 @@ class Session(object):
         The session is created from a set of traces, which usually have been
         produced by a Session object in the RCT stack, such as radical.pilot or
         radical.entk. Profiles are accepted in two forms: in a directory, or in
-        a tarball (of such a directory).  In the latter case, the tarball are
-        extracted into `$TMP`, and then handled just as the directory case.
+        a tarball (of such a directory).  For the `radical` session type, the
+        profiles are read directly from the tarball.  For all other session
+        types, the tarball is extracted next to it, and then handled just as
+        the directory case.
 
         If no `sid` (session ID) is specified, that ID is derived from the
         directory name.
@@ -43,11 +64,16 @@ class Session(object):
             assert sid
             assert src
             tgt = None
+            ext = None
 
         self._sid   = sid
         self._src   = src
         self._stype = stype
 
+        if stype == 'radical' and ext:
+            # no need to extract, profiles are streamed from the tarball
+            tgt = None
+
         if tgt and not os.path.exists(tgt):
 
             # need to extract
@@ -56,7 +82,7 @@ class Session(object):
                 if ext in ['tbz', 'tar.bz', 'tbz2', 'tar.bz2']:
                     tf = tarfile.open(name=src, mode='r:bz2')
                     tf.extractall(path=os.path.dirname(tgt))
-                elif ext in ['tgz, tar.gz']:
+                elif ext in ['tgz', 'tar.gz']:
                     tf = tarfile.open(name=src, mode='r:gz')
                     tf.extractall(path=os.path.dirname(tgt))
                 else:
@@ -79,22 +105,16 @@ class Session(object):
             if not src:
                 raise ValueError('RA session types need `src` specified')
 
-            profiles = list()
-            if os.path.isfile(src):
-                profiles.append(src)
+            # parse profiles in parallel, directly into an event store
+            if os.path.isdir(src):
+                profiles = ingest.find_profiles(src)
+                store, _ = ingest.read_profiles(profiles, sid=sid)
+            elif src.endswith('.prof'):
+                store, _ = ingest.read_profiles([src], sid=sid)
             else:
-                def _walkdir(path, profiles=[]):
-                    for root, dirs, files in os.walk(path):
-                        for f in files:
-                            if f.endswith('.prof'):
-                                profiles.append('%s/%s' % (root, f))
-                        for d in dirs:
-                            _walkdir('%s/%s' % (path, d), profiles)
-                        return profiles
-                profiles = _walkdir(src)
-
-            profiles                = ru.read_profiles(profiles, sid=sid)
-            self._profile, accuracy = ru.combine_profiles(profiles)
+                store, _ = ingest.read_tarball(src, sid=sid)
+            profile = None
+
             self._description       = {'tree'     : dict(),
                                        'entities' : list(),
                                        'hostmap'  : dict(),
@@ -109,7 +129,8 @@ class Session(object):
                                    'radical.pilot module to analyze this '
                                    'session - please install it.') from e
 
-            self._profile, accuracy, hostmap = \
+            store = None
+            profile, accuracy, hostmap = \
                     rpu.get_session_profile(sid=sid, src=self._src)
             self._description = \
                     rpu.get_session_description(sid=sid, src=self._src)
@@ -127,7 +148,8 @@ class Session(object):
                                    'radical.entk module to analyze this '
                                    'session - please install it.') from e
 
-            self._profile, accuracy, hostmap \
+            store = None
+            profile, accuracy, hostmap \
                               = reu.get_session_profile    (sid=sid, src=self._src)
             self._description = reu.get_session_description(sid=sid, src=self._src)
 
@@ -146,21 +168,30 @@ class Session(object):
         self._rep     = ru.Reporter('radical.analytics')
 
 
-        # user defined time offset
-        self._tzero   = 0.0
-
         # internal state is represented by a dict of entities:
         # dict keys are entity uids (which are assumed to be unique per
-        # session), dict values are ra.Entity instances.
+        # session), dict values are ra.Entity instances.  The entities' events
+        # are kept in a columnar event store shared by all entities.
+        self._store    = None
         self._entities = dict()
         if _init:
-            self._initialize_entities(self._profile)
+            self._initialize_entities(profile, store)
 
-        # we do some bookkeeping in self._properties where we keep a list of
-        # property values around which we encountered in self._entities.
-        self._properties = dict()
+        # inverted indexes from etypes, state names and event names to the uids
+        # of the entities which have them, to speed up entity queries.  If not
+        # initialized here, the indexes are built on first use.
+        self._index = None
         if _init:
-            self._initialize_properties()
+            self._initialize_index()
+
+        # we do some bookkeeping in self._properties where we keep a list of
+        # property values around which we encountered in self._entities.  The
+        # properties and the session's time range are initialized on first use.
+        self._properties = None
+
+        # query results are only memoized on request (see `memoize()`)
+        self._memo       = None
+        self._generation = 0
 
       # print('session loaded')
 
@@ -235,7 +266,7 @@ class Session(object):
                  'sid'         : self._sid,
                  'src'         : self._src,
                  'stype'       : self._stype,
-                 'profile'     : self._profile,
+                 'store'       : self._store,
                  'description' : self._description,
 
                  't_start'     : self._t_start,
@@ -243,6 +274,7 @@ class Session(object):
                  'ttc'         : self._ttc,
 
                  'entities'    : self._entities,
+                 'index'       : self._index,
                  'properties'  : self._properties,
                 }
 
@@ -256,7 +288,7 @@ class Session(object):
         self._sid         = state['sid']
         self._src         = state['src']
         self._stype       = state['stype']
-        self._profile     = state['profile']
+        self._store       = state['store']
         self._description = state['description']
 
         self._t_start     = state['t_start']
@@ -264,8 +296,11 @@ class Session(object):
         self._ttc         = state['ttc']
 
         self._entities    = state['entities']
+        self._index       = state['index']
         self._properties  = state['properties']
 
+        self._memo        = None
+        self._generation  = 0
         self._log         = ru.Logger('radical.analytics')
         self._rep         = ru.Reporter('radical.analytics')
 
@@ -273,39 +308,111 @@ class Session(object):
     # --------------------------------------------------------------------------
     #
     @staticmethod
-    def create(src, stype, sid=None, _entities=None, _init=True, cache=True):
-
-        sid, src, _, _ = Session._get_sid(sid, src)
-        base  = ru.get_radical_base('radical.analytics.cache')
-        cache = '%s/%s.pickle' % (base, sid)
+    def create(src, stype, sid=None, _entities=None, _init=True, cache=True,
+               fast_hash=False):
+        '''
+        Create a session like the constructor does, but use a cached session
+        if available.  The cache is keyed on a fingerprint of the session
+        source (see `cache.fingerprint()`), the session type and the RA
+        version, so that any change of the source invalidates the cache entry.
+        Cache entries are written atomically and are safe to share between
+        concurrent processes.
+
+        `cache` can be set to `False` to disable caching, or to
+        a `ra.Cache` instance to use instead of the default cache.
+        '''
 
         if _entities or not cache:
             # no caching
-            session = Session(src, stype, sid, _entities, _init)
+            return Session(src, stype, sid, _entities, _init)
 
-        try:
-            with open(cache, 'rb') as fin:
-                data = fin.read()
-                session = pickle.loads(data)
-                print(('using cache for %s' % sid))
-         #      import pprint
-         #      j = ru.read_json("%s/%s.json" % (src, sid))
-         #      rd = j['pilot'][0]['resource_details']
-         #      session.get(etype='pilot')[0].cfg['resource_details'] = rd
-         #      pprint.pprint(session.get(etype='pilot')[0].cfg)
-         #  with open(cache, 'wb') as fout:
-         #    # session = Session(src, stype, sid, _entities, _init)
-         #      fout.write(pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL))
-
-        except Exception:
-            print(('no cache for %s' % sid))
-            with open(cache, 'wb') as fout:
-                session = Session(src, stype, sid, _entities, _init)
-                fout.write(pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL))
+        if not isinstance(cache, _cache.Cache):
+            cache = _cache.get_cache()
+
+        sid, src, _, _ = Session._get_sid(sid, src)
+        path = cache.get_path(sid, _cache.fingerprint(src, stype, fast_hash))
+
+        session, cached = cache.get(path, lambda: Session(src, stype, sid,
+                                                          _entities, _init))
+        if cached: print(('using cache for %s' % sid))
+        else     : print(('no cache for %s'    % sid))
 
         return session
 
 
+    # --------------------------------------------------------------------------
+    #
+    def save(self, path):
+        '''
+        Store a snapshot of this session in the directory `path`: the event
+        columns are stored as `.npy` arrays, the session description is
+        pickled (it can have non-string keys, such as RP's state values), and
+        other metadata is stored as JSON.  See `load()`.
+        '''
+
+        os.makedirs(path, exist_ok=True)
+
+        self._initialize_t_range()
+        self._store.save(path)
+        np.save('%s/eids.npy' % path, self._eids())
+
+        meta = {'sid'         : self._sid,
+                'src'         : self._src,
+                'stype'       : self._stype,
+
+                't_start'     : self._t_start,
+                't_stop'      : self._t_stop,
+                'ttc'         : self._ttc,
+
+                'properties'  : {prop: list(values.items()) for prop, values
+                                 in self._get_properties().items()}}
+
+        with open('%s/session.json' % path, 'w') as fout:
+            json.dump(meta, fout)
+
+        with open('%s/description.pkl' % path, 'wb') as fout:
+            pickle.dump(self._description, fout)
+
+
+    # --------------------------------------------------------------------------
+    #
+    @staticmethod
+    def load(path, mmap_mode='r'):
+        '''
+        Load a session snapshot from the directory `path` (see `save()`).  The
+        event columns are memory mapped (unless `mmap_mode` is `None`), so only
+        the parts of the columns which are actually queried are read from disk.
+        '''
+
+        with open('%s/session.json' % path, 'r') as fin:
+            meta = json.load(fin)
+
+        with open('%s/description.pkl' % path, 'rb') as fin:
+            description = pickle.load(fin)
+
+        ret = Session.__new__(Session)
+        ret.__setstate__({'sid'         : meta['sid'],
+                          'src'         : meta['src'],
+                          'stype'       : meta['stype'],
+                          'store'       : EventStore.load(path, mmap_mode),
+                          'description' : description,
+
+                          't_start'     : meta['t_start'],
+                          't_stop'      : meta['t_stop'],
+                          'ttc'         : meta['ttc'],
+
+                          'entities'    : None,
+                          'index'       : None,
+                          'properties'  : {prop: dict(values) for prop, values
+                                           in meta['properties'].items()}})
+
+        # entities are created on first access
+        ret._entities = _EntityView(_EntityCache(ret._store, ret._description),
+                                    np.load('%s/eids.npy' % path))
+
+        return ret
+
+
     # --------------------------------------------------------------------------
     #
     def __deepcopy___(self, memo):
@@ -323,7 +430,7 @@ class Session(object):
 
     # --------------------------------------------------------------------------
     #
-    def _reinit(self, entities):
+    def _reinit(self, entities, store=None, index=None):
         '''
         After creating a session clone, we have identical sets of descriptions,
         profiles, and entities.  However, if we apply a filter during the clone
@@ -333,6 +440,12 @@ class Session(object):
         '''
 
         self._entities = entities
+        self._index    = index
+
+        if store is not None:
+            self._store = store
+
+        self._changed()
 
         # FIXME: we may want to filter the session description etc. wrt. to the
         #        entity types remaining after a filter.
@@ -340,21 +453,29 @@ class Session(object):
 
     # --------------------------------------------------------------------------
     #
+    # NOTE: `_t_start` and `_t_stop` are not corrected for tzero
     @property
     def t_start(self):
-        return self._t_start
+        self._initialize_t_range()
+        if self._t_start is None:
+            return None
+        return self._t_start - self._store.tzero
 
     @property
     def t_stop(self):
-        return self._t_stop
+        self._initialize_t_range()
+        if self._t_stop is None:
+            return None
+        return self._t_stop - self._store.tzero
 
     @property
     def ttc(self):
+        self._initialize_t_range()
         return self._ttc
 
     @property
     def t_range(self):
-        return [self._t_start, self._t_stop]
+        return [self.t_start, self.t_stop]
 
     @property
     def uid(self):
@@ -367,48 +488,160 @@ class Session(object):
 
     # --------------------------------------------------------------------------
     #
-    def _initialize_entities(self, profile):
+    def _initialize_entities(self, profile, store=None):
         '''
-        Populates self._entities from profile and self._description.
+        Populates self._entities from profile (or from an already populated
+        event store) and self._description.
 
         NOTE: We derive entity types via some heuristics for now: we assume the
         first part of any dot-separated uid to signify an entity type.
         '''
 
-        # create entities from the profile events:
-        entity_events = dict()
+        # create the columnar event store from the profile events, grouped by
+        # entity uid
+        if store is None:
+            store = EventStore(profile)
+        self._store = store
+
+        invalid = np.flatnonzero(self._store.time < -1)  # allow for 1sec
+        if len(invalid):                                 # rounding error
+            raise ValueError('invalid time stamp: %s'
+                             % self._store.events(invalid[0], invalid[0] + 1))
 
-        for event in profile:
+        # entities are created on first access, from the entity's events in
+        # the event store and from its session description
+        cache          = _EntityCache(self._store, self._description)
+        self._entities = _EntityView(cache, np.arange(len(self._store.uids)))
 
-            if event[ru.TIME] < -1:  # allow fow 1sec rounding error
-                raise ValueError('invalid time stamp: %s' % event)
 
-            uid = event[ru.UID]
-            if uid not in entity_events:
-                entity_events[uid] = list()
-            entity_events[uid].append(event)
+    # --------------------------------------------------------------------------
+    #
+    def _initialize_index(self):
+        '''
+        Populate `self._index` from `self._entities`.  The index maps etypes,
+        state names and event names to the set of uids of all entities which
+        have that etype, or which have at least one such state transition or
+        event::
+
+            {
+              'etype' : {'task' : {'task.000000', 'task.000001', ...}, ...},
+              'state' : {'DONE' : {'task.000000', ...}, ...},
+              'event' : {'exec_start' : {'task.000000', ...}, ...}
+            }
+
+        The index is built once on construction, and is pruned on filtering
+        (see `_prune_index()`).
+        '''
+
+        self._index = {'etype' : dict(),
+                       'state' : dict(),
+                       'event' : dict()}
 
-        # for all uids found,  create and store an entity.  We look up the
-        # entity type in one of the events (and assume it is consistent over
-        # all events for that uid)
-        for uid,events in list(entity_events.items()):
-            details = self._description.get('tree', dict()).get(uid, dict())
+        if not self._entities:
+            return
 
-            # hostid should be handled on RP level
-            hostid  = self._description.get('hostmap', dict()).get(uid)
-            if hostid:
-                details['hostid'] = hostid
+        codes, vocab = self._entities.etypes()
+        for uid, code in zip(self._entities, codes.tolist()):
+            self._index['etype'].setdefault(vocab[code], set()).add(uid)
 
-            self._entities[uid] = Entity(_uid=uid,
-                                         _profile=events,
-                                         _details=details)
+        store  = self._store
+        rows   = store.rows(self._eids())
+        uids   = np.array(store.uids, dtype=object)
+        owners = store.codes(ru.UID)  [rows]
+        events = store.codes(ru.EVENT)[rows]
+        states = store.codes(ru.STATE)[rows]
+
+        is_state = events == store.code(ru.EVENT, 'state')
+
+        for prop, codes, col, sel in [
+                ('state', states[is_state], ru.STATE, owners[is_state]),
+                ('event', events,           ru.EVENT, owners)]:
+
+            # distinct (code, owner) pairs, sorted by code
+            pairs  = np.unique(codes.astype(np.int64) * len(uids) + sel)
+            codes  = pairs // len(uids)
+            sel    = pairs %  len(uids)
+            bounds = np.flatnonzero(np.diff(codes)) + 1
+
+            vocab  = store.vocab(col)
+            for part in np.split(np.arange(len(pairs)), bounds):
+                if len(part):
+                    self._index[prop][vocab[codes[part[0]]]] = \
+                                             set(uids[sel[part]].tolist())
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _prune_index(self, uids):
+        '''
+        Return a copy of `self._index` which only refers to the given uids.
+        '''
+
+        if self._index is None:
+            # index not yet built
+            return None
+
+        keep = set(uids)
+        ret  = dict()
+        for prop, index in self._index.items():
+            ret[prop] = dict()
+            for key, found in index.items():
+                found = found & keep
+                if found:
+                    ret[prop][key] = found
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _eids(self):
+        '''
+        Return the event store indexes of all entities in this session.
+        '''
+
+        return _get_eids(self._entities)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _initialize_t_range(self):
+        '''
+        Set `t_start`, `t_stop` and `ttc` from the event times of all entities,
+        unless they are known already.
+        '''
+
+        if self._t_start is not None or not self._entities:
+            return
+
+        store  = self._store
+        eids   = self._eids()
+        begins = store.offsets[eids]
+        ends   = store.offsets[eids + 1]
+
+        self._t_start = float(store.time[begins].min())
+        self._t_stop  = float(store.time[ends - 1].max())
+        self._ttc     = self._t_stop - self._t_start
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _get_properties(self):
+        '''
+        Return `self._properties`, which are initialized on first use.
+        '''
+
+        if self._properties is None:
+            self._initialize_properties()
+
+        return self._properties
 
 
     # --------------------------------------------------------------------------
     #
     def _initialize_properties(self):
         '''
-        populate `self._properties` from `self._entities`.  `self._properties`∫
+        populate `self._properties` from `self._entities`.  `self._properties`
         has the following format::
 
             {
@@ -429,51 +662,124 @@ class Session(object):
           - etype (type of entities)
           - event (names of events)
           - state (state identifiers)
-        '''
 
-        # FIXME: initializing properties can be expensive, and we might not
-        #        always need them anyway.  So we can lazily defer this
-        #        initialization stop until the first query which requires them.
+        Initializing properties can be expensive, and we might not always need
+        them anyway - so this is deferred until the first query which requires
+        them (see `_get_properties()`).  Filtered sessions derive their
+        properties from the unfiltered ones (see `_derive_properties()`).
+        '''
 
         # we do *not* look at profile and descriptions anymore, those are only
-        # evaluated once on construction, in `_initialize_entities()`.  Now we
-        # don't parse all that stuff again, but only re-initialize after
-        # in-place filtering etc.
+        # evaluated once on construction, in `_initialize_entities()`.
         self._properties = {'uid'   : dict(),
                             'etype' : dict(),
                             'event' : dict(),
                             'state' : dict()}
 
-        if self._entities:
-            self._t_start = sys.float_info.max
-            self._t_stop  = sys.float_info.min
-
-        for euid,e in list(self._entities.items()):
-
-            self._t_start = min(self._t_start, e.t_start)
-            self._t_stop  = max(self._t_stop,  e.t_stop )
+        for euid in self._entities:
 
             if euid in self._properties['uid']:
                 raise RuntimeError('duplicated uid %s' % euid)
             self._properties['uid'][euid] = 1
 
-            if e.etype not in self._properties['etype']:
-                self._properties['etype'][e.etype] = 0
-            self._properties['etype'][e.etype] += 1
+        if not self._entities:
+            return
+
+        self._properties['etype'] = self._count_etypes()
+
+        counts = self._count_properties(self._eids())
+        for prop, (vocab, counts) in counts.items():
+            for code in np.flatnonzero(counts):
+                self._properties[prop][vocab[code]] = int(counts[code])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _count_etypes(self):
+        '''
+        Count the etypes of our entities (without creating the entities).  The
+        etypes are ordered by their first occurrence.
+        '''
+
+        codes, vocab = self._entities.etypes()
+        if not len(codes):
+            return dict()
+
+        values, first, counts = np.unique(codes, return_index=True,
+                                                 return_counts=True)
+        return {vocab[values[idx]]: int(counts[idx])
+                for idx in np.argsort(first)}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _count_properties(self, eids):
+        '''
+        Count the state and event values of the entities with the given store
+        indexes.  States are counted once per entity, events once per
+        occurrence.  Returns a dict which maps `state` and `event` to tuples of
+        the respective vocabulary and an array of counts per vocabulary code.
+        '''
+
+        store  = self._store
+        rows   = store.rows(eids)
+        events = store.codes(ru.EVENT)[rows]
+        states = store.codes(ru.STATE)[rows]
+        owners = store.codes(ru.UID)  [rows]
+
+        is_state = events == store.code(ru.EVENT, 'state')
+        n_states = len(store.vocab(ru.STATE))
+        pairs    = np.unique(owners[is_state].astype(np.int64) * n_states
+                                           + states[is_state])
 
-            for state in e.states:
-                if state not in self._properties['state']:
-                    self._properties['state'][state] = 0
-                self._properties['state'][state] += 1
+        ret = dict()
+        for prop, codes, col in [('state', pairs % n_states, ru.STATE),
+                                 ('event', events,           ru.EVENT)]:
+            vocab     = store.vocab(col)
+            ret[prop] = (vocab, np.bincount(codes, minlength=len(vocab)))
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _derive_properties(self, entities, properties):
+        '''
+        Return the properties of our entities, derived from the `properties` of
+        a superset of them, `entities`.  The state and event counts are derived
+        by subtracting the counts of the entities which are not in this
+        session, instead of counting all remaining states and events again.
+        Returns `None` if no `properties` are given, or if most entities are
+        removed - the properties are then initialized on first use.
+        '''
+
+        if properties is None:
+            return None
+
+        base    = _get_eids(entities)
+        keep    = np.zeros(len(self._store.uids), dtype=bool)
+        keep[self._eids()] = True
+        removed = base[~keep[base]]
+
+        if len(removed) > len(self._entities):
+            return None
 
-            for event in e.events:
-                name = event[ru.EVENT]
-                if name not in self._properties['event']:
-                    self._properties['event'][name] = 0
-                self._properties['event'][name] += 1
+        ret = {'uid'   : dict.fromkeys(self._entities, 1),
+               'etype' : self._count_etypes(),
+               'event' : dict(properties['event']),
+               'state' : dict(properties['state'])}
 
-        if self._entities:
-            self._ttc = self._t_stop - self._t_start
+        if not len(removed):
+            return ret
+
+        for prop, (vocab, counts) in self._count_properties(removed).items():
+            for code in np.flatnonzero(counts):
+                value = vocab[code]
+                count = ret[prop][value] - int(counts[code])
+                if count: ret[prop][value] = count
+                else    : del ret[prop][value]
+
+        return ret
 
 
     # --------------------------------------------------------------------------
@@ -491,10 +797,51 @@ class Session(object):
         event = ru.as_list(event)
         time  = ru.as_list(time )
 
-        ret = list()
-        for eid, entity in list(self._entities.items()):
+        # narrow down the set of candidate entities via the inverted indexes:
+        # the etype filter is fully resolved by the index, the state and event
+        # filters are only fully resolved if no time filter is applied.
+        if self._index is None:
+            self._initialize_index()
+
+        cands = None
+        for prop, values in [('etype', etype), ('state', state),
+                                               ('event', event)]:
+            if not values:
+                continue
+
+            found = set()
+            for value in values:
+                found |= self._index[prop].get(value, set())
+
+            if cands is None: cands  = found
+            else            : cands &= found
+
+        # plain uid strings (no regex patterns) can be resolved directly
+        if uids and all(isinstance(u, str) for u in uids):
+            if cands is None: cands  = set(uids)
+            else            : cands &= set(uids)
+            uids = None
+
+        # time constrained state and event filters are resolved via the time
+        # index of the event store
+        if time and (state or event):
+            found = self._match_time(state, event, time)
+            if cands is None: cands  = found
+            else            : cands &= found
+
+        if cands is None:
+            candidates = list(self._entities)
+
+        elif not uids and not names:
+            # all filters are resolved by the index
+            return [uid for uid in self._entities if uid in cands]
+
+        else:
+            candidates = [uid for uid in self._entities if uid in cands]
 
-            if etype and entity.etype not in etype: continue
+        # entities are only created if their names are needed
+        ret = list()
+        for euid in candidates:
 
             if uids:
                 try:
@@ -508,12 +855,12 @@ class Session(object):
                 for uid in uids:
                     if re_pattern and isinstance(uid, re_pattern):
                         # uid is actually a regex we use for matching
-                        if uid.match(entity.uid):
+                        if uid.match(euid):
                             keep = True
                             break
                     else:
                         # uid is a specific string to look out for
-                        if entity.uid == uid:
+                        if euid == uid:
                             keep = True
                             break
 
@@ -521,6 +868,7 @@ class Session(object):
                     continue
 
             if names:
+                entity = self._entities[euid]
                 try:
                     re_pattern = re.Pattern
                 except AttributeError:
@@ -544,34 +892,65 @@ class Session(object):
                 if not keep:
                     continue
 
-            if state:
-                match = False
-                for s,stuple in list(entity.states.items()):
-                    if time and not ru.in_range(stuple[ru.TIME], time):
-                        continue
-                    if s in state:
-                        match = True
-                        break
-                if not match:
-                    continue
+            # all existing filters have been passed - this is a match!
+            ret.append(euid)
 
-            if event:
-                match = False
-                for etuple in entity.events:
-                    if time and not ru.in_range(etuple[ru.TIME], time):
-                        continue
-                    if etuple[ru.EVENT] in event:
-                        match = True
-                        break
-                if not match:
-                    continue
+        return ret
 
-            # all existing filters have been passed - this is a match!
-            ret.append(eid)
+
+    # --------------------------------------------------------------------------
+    #
+    def _match_time(self, state, event, time):
+        '''
+        Return the set of uids of all entities which transitioned into any of
+        the given states (last transition, see `Entity.states`), and which have
+        any of the given events, within the time ranges `time`.  Only entities
+        with events in those time ranges are inspected.
+        '''
+
+        store  = self._store
+        owners = store.codes(ru.UID)
+        window = store.window(time)
+        uids   = store.uids
+        ret    = None
+
+        if event:
+            codes = [store.code(ru.EVENT, e) for e in event]
+            rows  = window[np.isin(store.codes(ru.EVENT)[window], codes)]
+            ret   = {uids[eid] for eid in np.unique(owners[rows]).tolist()}
+
+        if state:
+            eids  = np.unique(owners[window])
+            found = set()
+            for s in state:
+                rows   = self._last_transitions(s, store.rows(eids))
+                rows   = rows[in_ranges(store.times(rows), time)]
+                found |= {uids[eid] for eid in owners[rows].tolist()}
+
+            if ret is None: ret  = found
+            else          : ret &= found
 
         return ret
 
 
+    # --------------------------------------------------------------------------
+    #
+    def _last_transitions(self, state, rows):
+        '''
+        Return those of the given rows (grouped by entity) which are the last
+        transition of their entity into `state`.
+        '''
+
+        store = self._store
+        rows  = rows[store.match(state_condition(state), rows=rows)]
+
+        if not len(rows):
+            return rows
+
+        owners = store.codes(ru.UID)[rows]
+        return rows[np.append(owners[1:] != owners[:-1], True)]
+
+
     # --------------------------------------------------------------------------
     #
     def _dump(self):
@@ -587,11 +966,12 @@ class Session(object):
 
     # --------------------------------------------------------------------------
     #
+    @memoized
     def list(self, pname=None):
 
         if not pname:
             # return the name of all known properties
-            return list(self._properties.keys())
+            return list(self._get_properties().keys())
 
         if isinstance(pname, list):
             return_list = True
@@ -600,12 +980,13 @@ class Session(object):
             return_list = False
             pnames = [pname]
 
-        ret = list()
+        ret        = list()
+        properties = self._get_properties()
         for _pname in pnames:
-            if _pname not in self._properties:
+            if _pname not in properties:
                 raise KeyError('no such property known (%s) / %s'
-                        % (_pname, list(self._properties.keys())))
-            ret.append(list(self._properties[_pname].keys()))
+                        % (_pname, list(properties.keys())))
+            ret.append(list(properties[_pname].keys()))
 
         if return_list: return ret
         else          : return ret[0]
@@ -613,6 +994,7 @@ class Session(object):
 
     # --------------------------------------------------------------------------
     #
+    @memoized
     def get(self, etype=None, uid=None, name=None,
                   state=None, event=None, time=None):
 
@@ -632,18 +1014,23 @@ class Session(object):
         if inplace:
             # filter our own entity list, and refresh the entity based on
             # the new list
-            if uids != list(self._entities.keys()):
-                self._entities = {uid:self._entities[uid] for uid in uids}
-                self._initialize_properties()
+            if uids != list(self._entities):
+                entities, properties = self._entities, self._properties
+                self._entities   = self._entities.select(uids)
+                self._index      = self._prune_index(uids)
+                self._properties = self._derive_properties(entities,
+                                                           properties)
+                self._t_start    = None
+                self._t_stop     = None
+                self._ttc        = None
+
+                self._changed()
+
             return self
 
         else:
-            # create a new session with the resulting entity list
-            ret = Session(sid=self._sid, stype=self._stype, src=self._src,
-                          _init=False)
-            ret._reinit(entities={uid:self._entities[uid] for uid in uids})
-            ret._initialize_properties()
-            return ret
+            # create a light-weight view on the resulting entity list
+            return SessionView(self, uids)
 
 
     # --------------------------------------------------------------------------
@@ -660,7 +1047,7 @@ class Session(object):
             return self._description
 
         if mode == 'statistics':
-            return self._properties
+            return self._get_properties()
 
         if not etype:
             etype = self.list('etype')
@@ -727,7 +1114,9 @@ class Session(object):
 
     # --------------------------------------------------------------------------
     #
-    def ranges(self, state=None, event=None, time=None, collapse=True):
+    @memoized
+    def ranges(self, state=None, event=None, time=None, collapse=True,
+                     as_array=False):
         '''
         Gets a set of initial and final conditions, and computes time ranges in
         accordance to those conditions from all session entities. The resulting
@@ -739,31 +1128,174 @@ class Session(object):
 
         Setting 'collapse' to 'True' (default) will prompt the method to
         collapse the resulting set of ranges.
-        '''
 
-        ranges = list()
-        for uid,entity in list(self._entities.items()):
-            try:
-                ranges += entity.ranges(state, event, time, collapse=False)
-            except ValueError:
-                print(('no ranges for %s' % uid))
-                # ignore entities for which the conditions did not apply
-                # pass
+        The ranges are returned sorted by their end time.  If `as_array` is set
+        to `True`, they are returned as a tuple of two numpy arrays `(starts,
+        stops)` instead of a list of `[start, stop]` pairs.
+        '''
 
-        if not ranges:
-            return []
+        try:
+            starts, stops, owners = self._ranges(state, event, time)
+        except ValueError:
+            print(('no ranges for %s' % self.uid))
+            starts = stops = owners = np.zeros(0)
 
         if collapse:
-            ret = ru.collapse_ranges(ranges)
+            # collapsed ranges are disjoint, so sorting them by start time
+            # also sorts them by end time
+            starts, stops, _ = compute.collapse(starts, stops)
+
         else:
-            ret = ranges
+            # sort by end time, but retain the (sorted) ranges of each entity
+            # on ties, as `Entity.ranges()` would have returned them
+            order  = np.lexsort((stops, starts, owners, stops))
+            starts = starts[order]
+            stops  = stops [order]
+
+        if as_array:
+            return starts, stops
 
-        # sort ranges by start time and return
-        return sorted(ret, key=lambda r: r[1])
+        return np.stack([starts, stops], axis=1).tolist()
 
 
     # --------------------------------------------------------------------------
     #
+    def _ranges(self, state=None, event=None, time=None, expand=False):
+        '''
+        Vectorized implementation of `Entity.ranges()` (without collapsing)
+        for all entities of this session.  The initial and final conditions
+        are compiled once and matched against the event store columns, and the
+        ranges of all entities are then found in one grouped scan over the
+        matching events.
+
+        Returns three arrays: the range starts, the range stops, and the
+        indexes of the entities the ranges belong to (ie. their positions in
+        the entity order of this session).  The ranges are ordered by entity,
+        and per entity by their position in the entity's event sequence.
+        '''
+
+        if not state and not event:
+            raise ValueError('duration needs state and/or event arguments')
+
+        conds_init, conds_final = range_conditions(state, event)
+
+        store  = self._store
+        eids   = self._eids()
+        sizes  = store.offsets[eids + 1] - store.offsets[eids]
+        rows   = store.rows(eids)
+        times  = store.times(rows)
+
+        # owning entity and position of the first event of that entity, for
+        # all event positions
+        owners = np.repeat(np.arange(len(eids)), sizes)
+        firsts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+        is_init  = np.zeros(len(rows), dtype=bool)
+        is_final = np.zeros(len(rows), dtype=bool)
+        for cond in conds_init : is_init  |= store.match(cond, rows=rows)
+        for cond in conds_final: is_final |= store.match(cond, rows=rows)
+
+        inits  = np.flatnonzero(is_init)
+        finals = np.flatnonzero(is_final)
+
+        if expand:
+            # one range per entity, from the first initial event to the last
+            # final event (if that is after the initial event)
+            first = np.full(len(eids), len(rows))
+            last  = np.full(len(eids), -1)
+            np.minimum.at(first, owners[inits],  inits)
+            np.maximum.at(last,  owners[finals], finals)
+            keep  = last > first
+            starts, stops = first[keep], last[keep]
+
+        else:
+            starts, stops = self._scan_ranges(inits, finals, is_init,
+                                              owners, firsts)
+
+        starts = times[starts]
+        owners = owners[stops]
+        stops  = times[stops]
+
+        if time is not None and len(time):
+
+            # clip the ranges to the time filters, and drop them if they don't
+            # overlap with any filter
+            if not isinstance(time[0], list):
+                time = [time]
+
+            time   = np.asarray(time, dtype=np.float64).reshape(-1, 2)
+            starts = np.maximum(starts[:, None], time[None, :, 0])
+            stops  = np.minimum(stops [:, None], time[None, :, 1])
+            keep   = stops > starts
+            owners = np.repeat(owners, len(time))[keep.ravel()]
+            starts = starts[keep]
+            stops  = stops [keep]
+
+        return starts, stops, owners
+
+
+    # --------------------------------------------------------------------------
+    #
+    @staticmethod
+    def _scan_ranges(inits, finals, is_init, owners, firsts):
+        '''
+        Find the ranges for the sorted positions of initial and final events
+        (`inits` and `finals`) in a sequence of entity event sequences, where
+        `owners` and `firsts` give the owning entity and the position of the
+        first event of that entity for each position.  This vectorizes the scan
+        in `Entity.ranges()`: a range starts at the next initial event, and ends
+        at the next final event *after* it.  The search for the next initial
+        event resumes after that final event.
+
+        Returns the arrays of start and stop positions of all ranges.
+        '''
+
+        n_finals = len(finals)
+        ent      = owners[finals]
+
+        # previous final event of the same entity, if any
+        first_k       = np.ones(n_finals, dtype=bool)
+        first_k[1:]   = ent[1:] != ent[:-1]
+        prev          = np.zeros(n_finals, dtype=np.int64)
+        prev[1:]      = finals[:-1]
+
+        # initial events between the previous final event (or the entity
+        # begin) and this final event
+        begin         = np.where(first_k, firsts[finals], prev + 1)
+        n_inits       = np.concatenate(([0], np.cumsum(is_init)))
+        gap           = n_inits[finals] > n_inits[begin]
+
+        # final events which also match an initial condition can *start*
+        # a range (if no range is open at that point)
+        both          = is_init[finals]
+        prev_both     = np.zeros(n_finals, dtype=bool)
+        prev_both[1:] = both[:-1]
+
+        # A range is open right before a final event (which then ends it) if
+        # there is an initial event in the gap before, or if the previous final
+        # event started a range.  That recursion only applies to consecutive
+        # final events which also are initial events, with no other initial
+        # events in between: along such chains, open and closed alternate.
+        chain    = first_k | gap | ~prev_both
+        heads    = np.flatnonzero(chain)
+        head     = heads[np.cumsum(chain) - 1]
+        is_open  = gap[head] ^ ((np.arange(n_finals) - head) % 2 == 1)
+
+        prev_open     = np.zeros(n_finals, dtype=bool)
+        prev_open[1:] = is_open[:-1]
+        prev_start    = ~first_k & prev_both & ~prev_open
+
+        k      = np.flatnonzero(is_open)
+        starts = prev[k].copy()
+        found  = ~prev_start[k]
+        starts[found] = inits[np.searchsorted(inits, begin[k][found])]
+
+        return starts, finals[k]
+
+
+    # --------------------------------------------------------------------------
+    #
+    @memoized
     def timestamps(self, state=None, event=None, time=None, first=False):
         '''
         This method accepts a set of conditions, and returns the list of
@@ -784,19 +1316,108 @@ class Session(object):
         The returned list will be sorted.
         '''
 
-        ret = list()
-        for _,entity in list(self._entities.items()):
-            tmp = entity.timestamps(state=state, event=event, time=time)
-            if tmp and first:
-                ret.append(tmp[0])
+        if not state and not event:
+            # no filters: entities return all their events
+            ret = list()
+            for _,entity in list(self._entities.items()):
+                tmp = entity.timestamps(time=time)
+                if tmp and first:
+                    ret.append(tmp[0])
+                else:
+                    ret += tmp
+
+            return sorted(ret)
+
+        return self._timestamps(state, event, time, first).tolist()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _selected_rows(self):
+        '''
+        Return a boolean mask over the event store rows which is `True` for all
+        events of the entities in this session.
+        '''
+
+        # the entity index of an event equals the uid code in the store
+        selected = np.zeros(len(self._store.uids), dtype=bool)
+        selected[self._eids()] = True
+
+        return selected[self._store.codes(ru.UID)]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _timestamps(self, state=None, event=None, time=None, first=False,
+                          selected=None):
+        '''
+        Vectorized implementation of `timestamps()` over the event store,
+        returns a sorted numpy array.  `selected` can pass a precomputed row
+        selection (see `_selected_rows()`).
+        '''
+
+        store  = self._store
+        owners = store.codes(ru.UID)
+
+        if not self._entities:
+            return np.zeros(0, dtype=np.float64)
+
+        if time:
+            # only inspect the events of our entities in the time ranges, and
+            # the entities those events belong to
+            window = store.window(time)
+            if selected is None:
+                eids   = np.unique(owners[window])
+                mine   = np.array([store.uids[eid] in self._entities
+                                       for eid in eids.tolist()], dtype=bool)
+                window = window[np.isin(owners[window], eids[mine])]
             else:
-                ret += tmp
+                window = window[selected[window]]
+
+        elif selected is None:
+            selected = self._selected_rows()
+
+        found_eids  = list()
+        found_times = list()
+
+        for cond in as_conditions(event):
+            if time: found = window[store.match(cond, rows=window)]
+            else   : found = np.flatnonzero(store.match(cond) & selected)
+            found_eids.append (owners[found])
+            found_times.append(store.times(found))
+
+        # for states, only the last transition into that state counts
+        state = ru.as_list(state)
+        if state:
+            if time: rows = store.rows(np.unique(owners[window]))
+            else   : rows = np.flatnonzero(selected)
 
-        return sorted(ret)
+        for s in state:
+            found = self._last_transitions(s, rows)
+            found_eids.append (owners[found])
+            found_times.append(store.times(found))
+
+        eids  = np.concatenate(found_eids)
+        times = np.concatenate(found_times)
+
+        if time:
+            keep  = in_ranges(times, time)
+            eids  = eids [keep]
+            times = times[keep]
+
+        if first and len(times):
+            # earliest timestamp per entity
+            order = np.lexsort((times, eids))
+            eids  = eids [order]
+            times = times[order]
+            times = times[np.insert(eids[1:] != eids[:-1], 0, True)]
+
+        return np.sort(times)
 
 
     # --------------------------------------------------------------------------
     #
+    @memoized
     def duration(self, state=None, event=None, time=None, ranges=None):
         '''
         This method accepts the same set of parameters as the `ranges()` method,
@@ -810,8 +1431,8 @@ class Session(object):
         where `rp.FINAL` is a list of final task states.
         '''
 
-        if not ranges:
-            ranges = self.ranges(state, event, time)
+        if ranges is None or not len(ranges):
+            starts, stops = self.ranges(state, event, time, as_array=True)
 
         else:
             assert not state
@@ -820,14 +1441,70 @@ class Session(object):
 
             # make sure the ranges are collapsed (although they likely are
             # already...)
-            ranges = ru.collapse_ranges(ranges)
+            ranges = np.asarray(ranges, dtype=np.float64).reshape(-1, 2)
+            starts, stops, _ = compute.collapse(ranges[:, 0], ranges[:, 1])
 
-        return sum(r[1] - r[0] for r in ranges)
+        if not len(starts):
+            return 0
+
+        # sum up sequentially (not pairwise), to get the same result as when
+        # summing up the ranges in a loop
+        return float(np.cumsum(stops - starts)[-1])
 
 
     # --------------------------------------------------------------------------
     #
-    def concurrency(self, state=None, event=None, time=None, sampling=None):
+    @memoized
+    def durations(self, specs, time=None):
+        '''
+        This method computes the durations of all entities in this session for
+        several duration definitions at once.  `specs` is expected to be a dict
+        of named duration definitions, where each definition is a pair of
+        initial and final event conditions as accepted by the `event` parameter
+        of `Entity.duration()`, or a dict of `state` and / or `event` parameters
+        for that method.  The `time` parameter is interpreted as documented for
+        the `ranges()` method.
+
+        Returns a dict with the same keys, where each value is a numpy array of
+        the durations of all entities (in the order returned by `get()`).  For
+        entities for which a duration is not defined, the value is `NaN`.
+
+        Example::
+
+           durations = session.filter(etype='task').durations(
+                   {'exec'  : [{ru.EVENT: 'exec_start'},
+                               {ru.EVENT: 'exec_stop' }],
+                    'total' : {'state': [rp.NEW, rp.FINAL]}})
+        '''
+
+        ret = dict()
+        for name, spec in specs.items():
+
+            if not isinstance(spec, dict):
+                spec = {'event': spec}
+
+            starts, stops, owners = self._ranges(time=time, **spec)
+
+            # like `Entity.duration()`, sum up the collapsed ranges per entity
+            starts, stops, owners = compute.collapse(starts, stops, owners)
+
+            # NOTE: `bincount` returns integers if there are no ranges at all
+            n_ranges  = np.bincount(owners, minlength=len(self._entities))
+            durations = np.bincount(owners, weights=stops - starts,
+                                    minlength=len(self._entities))
+            durations = durations.astype(np.float64, copy=False)
+            durations[n_ranges == 0] = np.nan
+
+            ret[name] = durations
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    @memoized
+    def concurrency(self, state=None, event=None, time=None, sampling=None,
+                          as_array=False):
         '''
         This method accepts the same set of parameters as the `ranges()` method,
         and will use the `ranges()` method to obtain a set of ranges.  It will
@@ -850,6 +1527,8 @@ class Session(object):
               [time_n, concurrency_n] ]
 
         where `time_n` is represented as `float`, and `concurrency_n` as `int`.
+        If `as_array` is set to `True`, the time series is instead returned as
+        a tuple of two numpy arrays `(times, concurrencies)`.
 
         Example::
 
@@ -858,76 +1537,23 @@ class Session(object):
 
         '''
 
-        INC =  1  # increase concurrency
-        DEC = -1  # decrease concurrency
+        starts, stops, owners = self._ranges(state, event, time)
 
-        ranges = list()
-        for _,e in list(self._entities.items()):
-            ranges += e.ranges(state, event, time)
+        # ranges are collapsed per entity
+        starts, stops, _ = compute.collapse(starts, stops, owners)
+        times, values    = compute.concurrency(starts, stops,
+                                               sampling=sampling)
+        if as_array:
+            return times, values
 
-        if not ranges:
-            return []
-
-        times = list()
-        # get all start and end times for all ranges.  The start of a range will
-        # increase concurrency by one at that time stamp, and the end will
-        # decrease it by one again.
-        for r in ranges:
-            times.append([r[0], INC])
-            times.append([r[1], DEC])
-
-        # sort those times
-        times.sort()
-
-        # get the overall concurrency data
-        conc = 0
-        data = list()  # [[time, concurrency], ...]
-        for time, val in times:
-            conc += val
-            data.append([time, conc])
-
-        # collapse time stamps (use last value on same time stamps)
-        collapsed = list()
-        last      = data[0]
-        for time, val in data[1:]:
-            if time != last[0]:
-                collapsed.append(last)
-            last = [time, val]
-
-        # append last time
-        collapsed.append(last)
-
-        # make sure we start at zero (at time of first event)
-        collapsed.insert(0, [collapsed[0][0], 0])
-
-        if not sampling:
-            # return as is
-            ret = collapsed
-
-        else:
-            # select data points according to sampling
-            # get min time, and create timestamps at regular intervals
-            t   = times[0][0]
-            v   = collapsed[0][1]
-            ret = list()
-            for time, val in collapsed:
-                while time >= t:
-                    ret.append([t, v])
-                    t += sampling
-                # value is changed after reaching the next timestamp
-                v = val
-
-            # append last time stamp if it is not appended, yet
-            if ret[-1] != [t, v]:
-                ret.append([t, v])
-
-        return ret
+        return compute.as_series(times, values)
 
 
     # --------------------------------------------------------------------------
     #
+    @memoized
     def rate(self, state=None, event=None, time=None, sampling=None,
-            first=False):
+            first=False, as_array=False):
         '''
         This method accepts the same parameters as the `timestamps()` method: it
         will count all matching events and state transitions as given, and will
@@ -959,86 +1585,80 @@ class Session(object):
         The 'first' is defined, only the first matching event fir the selected
         entities is considered viable.
 
+        If `as_array` is set to `True`, the time series is instead returned as
+        a tuple of two numpy arrays `(times, rates)`.
+
         Example::
 
            session.filter(etype='task').rate(state=[rp.AGENT_EXECUTING])
         '''
 
-        timestamps = self.timestamps(event=event, state=state, time=time,
-                                     first=first)
+        timestamps = self._timestamps(event=event, state=state, time=time,
+                                      first=first)
+        times, rates = compute.rate(timestamps, sampling=sampling)
 
-        if not timestamps:
-            # nothing to do
-            return []
+        if as_array:
+            return times, rates
 
+        return compute.as_series(times, rates)
 
-        times = list()
-        if sampling:
-            # get min and max timestamp, and create sampling points at
-            # regular intervals
-            r_min = timestamps[0]
-            r_max = timestamps[-1]
 
-            t = r_min
-            while t < r_max:
-                times.append(t)
-                t += sampling
-            times.append(r_max)
-
-        else:
-            # we create an entry at all timestamps
-            times = timestamps[:]
+    # --------------------------------------------------------------------------
+    #
+    @memoized
+    def rates(self, events, time=None, sampling=None, first=False,
+                    as_array=False):
+        '''
+        This method computes the event rates for several event specifications at
+        once.  `events` is expected to be a dict of named event specifications,
+        as accepted by the `event` parameter of the `rate()` method, and the
+        method returns a dict of rate time series with the same keys.  All other
+        parameters are interpreted as documented for the `rate()` method.
 
-        if not times:
-            # nothing to do
-            return []
+        Example::
 
-        # we need to make sure that no two consecutive timestamps are the same,
-        # as that would lead to a division by zero later on
-        times = sorted(set(times))
+           session.filter(etype='task').rates(
+                   {'scheduled': {ru.EVENT: 'schedule_ok'},
+                    'executed' : {ru.EVENT: 'exec_start' }}, sampling=1.0)
+        '''
 
-      # import pprint
-      # pprint.pprint(times)
+        # the entity selection is shared by all event specifications
+        selected = self._selected_rows() if self._entities else None
 
-        # make sure we start in correct state, and first data point does not
-        # occur before sampling starts
-        assert timestamps[0] >= times[0]
+        ret = dict()
+        for name, event in events.items():
 
-        # we have the time sequence, now compute event rate at those points
-        ts_idx  = 0                # index into the list of timestamps
-        ts_len  = len(timestamps)  # number of timestamps
-        ret     = list()           # our rate time series
-        t_start = times[0]         # current samplint window
-        t_stop  = times[0]
+            timestamps   = self._timestamps(event=event, time=time, first=first,
+                                            selected=selected)
+            times, rates = compute.rate(timestamps, sampling=sampling)
 
-        for t in times[1:]:
-            t_start = t_stop       # slide sampling window to next sample time
-            t_stop  = t
-            cnt     = 0            # reset event counter
+            if as_array: ret[name] = (times, rates)
+            else       : ret[name] = compute.as_series(times, rates)
 
+        return ret
 
-            while ts_idx < ts_len:
-                if timestamps[ts_idx] <= t_stop:
-                    # timestamp is in range, count event
-                    cnt += 1
-                else:
-                    # we need to slide the sampling window
-                    break
-                # go to next timestamp
-                ts_idx += 1
 
-          # print 'window: %f - %f (%f) : %5d' % \
-          #         (t_start, t_stop, t_stop - t_start, cnt)
+    # --------------------------------------------------------------------------
+    #
+    def utilization(self, metrics, rtype='cpu', udurations=None):
 
-            # sampling window completed - store rate of events in sample
-            ret.append([t_stop, cnt / (t_stop - t_start)])
+        provided, consumed = self._get_resources(rtype, udurations)
+        stats_abs, stats_rel, info = _utilization_stats(
+                self.uid, len(self.get(etype='task')), provided, consumed,
+                metrics)
 
-        return ret
+        return provided, consumed, stats_abs, stats_rel, info
 
 
     # --------------------------------------------------------------------------
     #
-    def utilization(self, metrics, rtype='cpu', udurations=None):
+    def _get_resources(self, rtype='cpu', udurations=None):
+        '''
+        Return the resources provided to and consumed by the entities of this
+        session as boxes (see `Experiment.utilization()`).  Computing those
+        boxes is the expensive part of `utilization()`, and does not depend on
+        the utilization metrics.
+        '''
 
         if self._stype != 'radical.pilot':
             raise ValueError('session utilization is only available on '
@@ -1046,82 +1666,10 @@ class Session(object):
 
         import radical.pilot as rp
 
-        provided  = rp.utils.get_provided_resources(self, rtype)
-        consumed  = rp.utils.get_consumed_resources(self, rtype, udurations)
-        stats_abs = {'total':   0.0}
-        stats_rel = {'total': 100.0}
-        total     = 0.0
-
-        for pid in provided['total']:
-            for box in provided['total'][pid]:
-                stats_abs['total'] += (box[1] - box[0]) * \
-                                      (box[3] - box[2]  + 1)
-        total = (max(stats_abs['total'], 1))
-
-        for metric in metrics:
-            if isinstance(metric, list):
-                name  = metric[0]
-                parts = metric[1]
-            else:
-                name  = metric
-                parts = [metric]
-
-            if name not in stats_abs:
-                stats_abs[name] = 0.0
-
-            for part in parts:
-                for uid in consumed[part]:
-                    for box in consumed[part][uid]:
-                        stats_abs[name] += (box[1] - box[0]) * \
-                                           (box[3] - box[2]  + 1)
+        provided = rp.utils.get_provided_resources(self, rtype)
+        consumed = rp.utils.get_consumed_resources(self, rtype, udurations)
 
-        info  = ''
-        info += '%s [%d]\n' % (self.uid, len(self.get(etype='task')))
-
-        for metric in metrics + ['total']:
-            if isinstance(metric, list):
-                name  = metric[0]
-                parts = metric[1]
-            else:
-                name  = metric
-                parts = ''
-
-            val = stats_abs[name]
-            if val == 0.0: glyph = '!'
-            else         : glyph = ''
-            rel = 100.0 * val / total
-            stats_rel[name] = rel
-            info += '    %-20s: %14.3f  %8.3f%%  %2s  %s\n' \
-                  % (name, val, rel, glyph, parts)
-
-        have = 0.0
-        over = 0.0
-        work = 0.0
-        for metric in sorted(stats_abs.keys()):
-            if metric == 'total':
-                have  += stats_abs[metric]
-            else:
-                if metric == 'Execution Cmd':
-                    work  += stats_abs[metric]
-                else:
-                    over  += stats_abs[metric]
-
-        miss = have - over - work
-
-        rel_over = 100.0 * over / total
-        rel_work = 100.0 * work / total
-        rel_miss = 100.0 * miss / total
-
-        stats_abs['Other'] = miss
-        stats_rel['Other'] = rel_miss
-
-        info += '\n'
-        info += '    %-20s: %14.3f  %8.3f%%\n' % ('total', have, 100.0)
-        info += '    %-20s: %14.3f  %8.3f%%\n' % ('over',  over, rel_over)
-        info += '    %-20s: %14.3f  %8.3f%%\n' % ('work',  work, rel_work)
-        info += '    %-20s: %14.3f  %8.3f%%\n' % ('miss',  miss, rel_miss)
-
-        return provided, consumed, stats_abs, stats_rel, info
+        return provided, consumed
 
 
     # --------------------------------------------------------------------------
@@ -1526,7 +2074,7 @@ class Session(object):
                 if not sv:
                     if es:
                         self._rep.warn('  %-30s : %s' % (et, list(es.keys())))
-                        e._consistency['state_model'] = None
+                        e.consistency['state_model'] = None
                     continue
 
                 self._rep.info('  %-30s :' % e.uid)
@@ -1586,8 +2134,8 @@ class Session(object):
 
                     self._rep.ok('+')
 
-                e._consistency['state_model'] = sm_ok
-                e._consistency['log'].extend(sm_log)
+                e.consistency['state_model'] = sm_ok
+                e.consistency['log'].extend(sm_log)
 
                 if not sm_ok:
                     ret.append(e.uid)
@@ -1604,17 +2152,471 @@ class Session(object):
         Setting a `tzero` timestamp will shift all timestamps for all entities
         in this session by that amount.  This simplifies the alignment of
         multiple sessions, or the focus on specific events.
+
+        The event data are not changed: `tzero` is kept as an offset which is
+        applied whenever event times are read.  That offset is shared by all
+        views on the same session (see `filter()`), as they share their
+        entities and events.
         '''
 
-        old_tzero   = self._tzero
-        self._tzero = t
+        self._store.set_tzero(t)
+        self._changed()
 
-        for entity in list(self._entities.values()):
 
-            # entity.states are shallow copies of the events
-            for event in entity.events:
-                event[ru.TIME] += old_tzero
-                event[ru.TIME] -= self._tzero
+    # --------------------------------------------------------------------------
+    #
+    def _changed(self):
+        '''
+        Drop all memoized results, and assign a new `_generation`: the
+        generation changes whenever the entities of the session are filtered
+        in place, or when the event times are shifted (see `tzero()`).
+        Results computed elsewhere for a session can thus be checked for
+        being up to date - also if the session was loaded again and changed
+        in another way since.  Unchanged sessions have generation `0`.
+        '''
+
+        self._generation = next(_generations)
+
+        if self._memo is not None:
+            self._memo.clear()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def memoize(self, size=128):
+        '''
+        Memoize the results of the query methods (`get()`, `list()`,
+        `ranges()`, `timestamps()`, `duration()`, `durations()`,
+        `concurrency()`, `rate()` and `rates()`), so that repeated queries with
+        the same arguments are answered without recomputation.  At most `size`
+        results are kept, least recently used results are dropped first.  A
+        `size` of `0` disables memoization.
+
+        Memoized results are dropped whenever they may become invalid, i.e., on
+        in-place filtering and on `tzero` changes.  Callers receive copies of
+        the results, so modifying them does not affect later queries.  Views
+        created by `filter()` memoize their results if their session does.
+        '''
+
+        if size: self._memo = Memo(size)
+        else   : self._memo = None
+
+
+    # --------------------------------------------------------------------------
+    #
+    def memo_stats(self):
+        '''
+        Return the hit / miss counters and size of the result memo (see
+        `memoize()`), or `None` if results are not memoized.
+        '''
+
+        if self._memo is None:
+            return None
+
+        return self._memo.stats()
+
+
+# ------------------------------------------------------------------------------
+#
+def _get_eids(entities):
+    '''
+    Return the event store indexes of the given entities (a dict or an
+    `_EntityView`).
+    '''
+
+    if isinstance(entities, _EntityView):
+        return entities.eids
+
+    return np.array([e._eid for e in entities.values()], dtype=np.int64)
+
+
+# ------------------------------------------------------------------------------
+#
+def _utilization_stats(sid, n_tasks, provided, consumed, metrics):
+    '''
+    Compute the absolute and relative utilization stats and the info string
+    of `Session.utilization()` for the session `sid` with `n_tasks` tasks,
+    from the resources `provided` to and `consumed` by its entities.
+    '''
+
+    stats_abs = {'total':   0.0}
+    stats_rel = {'total': 100.0}
+    total     = 0.0
+
+    for pid in provided['total']:
+        for box in provided['total'][pid]:
+            stats_abs['total'] += (box[1] - box[0]) * \
+                                  (box[3] - box[2]  + 1)
+    total = (max(stats_abs['total'], 1))
+
+    for metric in metrics:
+        if isinstance(metric, list):
+            name  = metric[0]
+            parts = metric[1]
+        else:
+            name  = metric
+            parts = [metric]
+
+        if name not in stats_abs:
+            stats_abs[name] = 0.0
+
+        for part in parts:
+            for uid in consumed[part]:
+                for box in consumed[part][uid]:
+                    stats_abs[name] += (box[1] - box[0]) * \
+                                       (box[3] - box[2]  + 1)
+
+    info  = ''
+    info += '%s [%d]\n' % (sid, n_tasks)
+
+    for metric in metrics + ['total']:
+        if isinstance(metric, list):
+            name  = metric[0]
+            parts = metric[1]
+        else:
+            name  = metric
+            parts = ''
+
+        val = stats_abs[name]
+        if val == 0.0: glyph = '!'
+        else         : glyph = ''
+        rel = 100.0 * val / total
+        stats_rel[name] = rel
+        info += '    %-20s: %14.3f  %8.3f%%  %2s  %s\n' \
+              % (name, val, rel, glyph, parts)
+
+    have = 0.0
+    over = 0.0
+    work = 0.0
+    for metric in sorted(stats_abs.keys()):
+        if metric == 'total':
+            have  += stats_abs[metric]
+        else:
+            if metric == 'Execution Cmd':
+                work  += stats_abs[metric]
+            else:
+                over  += stats_abs[metric]
+
+    miss = have - over - work
+
+    rel_over = 100.0 * over / total
+    rel_work = 100.0 * work / total
+    rel_miss = 100.0 * miss / total
+
+    stats_abs['Other'] = miss
+    stats_rel['Other'] = rel_miss
+
+    info += '\n'
+    info += '    %-20s: %14.3f  %8.3f%%\n' % ('total', have, 100.0)
+    info += '    %-20s: %14.3f  %8.3f%%\n' % ('over',  over, rel_over)
+    info += '    %-20s: %14.3f  %8.3f%%\n' % ('work',  work, rel_work)
+    info += '    %-20s: %14.3f  %8.3f%%\n' % ('miss',  miss, rel_miss)
+
+    return stats_abs, stats_rel, info
+
+
+# ------------------------------------------------------------------------------
+#
+class _EntityCache(object):
+    '''
+    Creates the entities of a session on first access, and keeps them for
+    later use.  Entities are identified by their event store index (`eid`).
+    The cache is shared by a session and all views derived from it.
+    '''
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, store, description):
+
+        self._store    = store
+        self._tree     = description.get('tree',    dict())
+        self._hostmap  = description.get('hostmap', dict())
+        self._entities = dict()
+        self._etypes   = None
+
+
+    # --------------------------------------------------------------------------
+    #
+    @property
+    def store(self):
+        return self._store
+
+
+    # --------------------------------------------------------------------------
+    #
+    def details(self, uid):
+        '''
+        Return the details for the entity with the given uid, as found in the
+        entity tree of the session description.
+        '''
+
+        details = self._tree.get(uid)
+
+        # hostid should be handled on RP level
+        hostid  = self._hostmap.get(uid)
+        if hostid:
+            if details is None:
+                details = dict()
+            details['hostid'] = hostid
+
+        # entities without tree information share an (unmodified) empty dict
+        if details is None:
+            details = _NO_DETAILS
+
+        return details
+
+
+    # --------------------------------------------------------------------------
+    #
+    def get(self, eid):
+        '''
+        Return the entity with the given event store index.
+        '''
+
+        entity = self._entities.get(eid)
+
+        if entity is None:
+            uid    = self._store.uids[eid]
+            entity = Entity(_uid=uid,
+                            _profile=None,
+                            _details=self.details(uid),
+                            _store=self._store,
+                            _eid=eid)
+            self._entities[eid] = entity
+
+        return entity
+
+
+    # --------------------------------------------------------------------------
+    #
+    def etypes(self):
+        '''
+        Return the etypes of all entities in the event store as a tuple of an
+        array of etype codes (indexed by eid) and the etype vocabulary.  The
+        etypes are determined without creating the entities.
+        '''
+
+        if self._etypes is None:
+
+            uids   = self._store.uids
+            vocab  = dict()
+            codes  = np.empty(len(uids), dtype=np.int32)
+            for eid, uid in enumerate(uids):
+                etype      = get_etype(uid, self.details(uid))
+                codes[eid] = vocab.setdefault(etype, len(vocab))
+
+            self._etypes = (codes, list(vocab))
+
+        return self._etypes
+
+
+# ------------------------------------------------------------------------------
+#
+class _EntityView(Mapping):
+    '''
+    A read-only mapping from uids to the entities of a session.  The selected
+    entities are kept as an array of event store indexes (in the order of the
+    entities) plus a mask over all event store entities.  The entities
+    themselves are only created when accessed (see `_EntityCache`), so that
+    queries which only touch some entities do not pay for creating all of
+    them.
+    '''
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, cache, eids):
+
+        self._cache = cache
+        self._store = cache.store
+        self._eids  = np.asarray(eids, dtype=np.int64)
+        self._mask  = np.zeros(len(self._store.uids), dtype=bool)
+
+        self._mask[self._eids] = True
+
+
+    # --------------------------------------------------------------------------
+    #
+    @property
+    def eids(self):
+        return self._eids
+
+
+    # --------------------------------------------------------------------------
+    #
+    def etypes(self):
+        '''
+        Return the etype codes of the selected entities (in entity order) and
+        the etype vocabulary (see `_EntityCache.etypes()`).
+        '''
+
+        codes, vocab = self._cache.etypes()
+
+        return codes[self._eids], vocab
+
+
+    # --------------------------------------------------------------------------
+    #
+    def select(self, uids):
+        '''
+        Return a view on the given subset of our entities.
+        '''
+
+        code = self._store.code
+        eids = np.fromiter((code(ru.UID, uid) for uid in uids),
+                           dtype=np.int64, count=len(uids))
+
+        if (eids < 0).any() or not self._mask[eids].all():
+            raise KeyError('unknown uids')
+
+        return _EntityView(self._cache, eids)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __getitem__(self, uid):
+
+        eid = self._store.code(ru.UID, uid)
+        if eid < 0 or not self._mask[eid]:
+            raise KeyError(uid)
+
+        return self._cache.get(eid)
+
+
+    def __contains__(self, uid):
+
+        eid = self._store.code(ru.UID, uid)
+        return eid >= 0 and bool(self._mask[eid])
+
+
+    def __iter__(self):
+
+        uids = self._store.uids
+        return (uids[eid] for eid in self._eids.tolist())
+
+
+    def __len__(self):
+
+        return len(self._eids)
+
+
+    def values(self):
+
+        get = self._cache.get
+        return [get(eid) for eid in self._eids.tolist()]
+
+
+# ------------------------------------------------------------------------------
+#
+class SessionView(Session):
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, session, uids):
+        '''
+        A light-weight, filtered view on a session, as returned by
+        `Session.filter(inplace=False)`.  The view shares the event store, the
+        entities and the entity index of the session it is derived from, and
+        only keeps track of the selected subset of entities.  Views support
+        all query methods of a session, and can be filtered further (in place,
+        or into nested views).
+
+        The properties and the time range of a view are initialized on first
+        use.  The properties are derived from those of the parent session if
+        that has its properties initialized already.
+        '''
+
+        # pylint: disable=super-init-not-called
+
+        self._sid         = session._sid
+        self._src         = session._src
+        self._stype       = session._stype
+        self._store       = session._store
+        self._description = session._description
+        self._log         = session._log
+        self._rep         = session._rep
+
+        self._t_start     = None
+        self._t_stop      = None
+        self._ttc         = None
+
+        # the index of the parent session refers to a superset of our
+        # entities, which is fine as the query methods only consider entities
+        # which are part of the view
+        self._index       = session._index
+        self._properties  = None
+
+        # views memoize their own results if their session does
+        if session._memo is not None: self._memo = Memo(session._memo.size)
+        else                        : self._memo = None
+
+        self._generation  = 0
+
+        self._entities    = session._entities.select(uids)
+
+        # entities and properties to derive our properties from
+        if session._properties is not None:
+            self._base = (session._entities, session._properties)
+        elif isinstance(session, SessionView):
+            self._base = session._base
+        else:
+            self._base = (None, None)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __getstate__(self):
+
+        state = super().__getstate__()
+        state['properties'] = self._get_properties()
+
+        return state
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __setstate__(self, state):
+
+        super().__setstate__(state)
+        self._base = (None, None)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _initialize_properties(self):
+
+        self._properties = self._derive_properties(*self._base)
+        self._base       = (None, None)
+
+        if self._properties is None:
+            super()._initialize_properties()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def filter(self, etype=None, uid=None, name=None,
+                     state=None, event=None, time=None, inplace=True):
+
+        uids = self._apply_filter(etype=etype, uid=uid, name=name,
+                                  state=state, event=event, time=time)
+
+        if not inplace:
+            return SessionView(self, uids)
+
+        # filters only ever remove entities
+        if len(uids) != len(self._entities):
+
+            if self._properties is not None:
+                self._base = (self._entities, self._properties)
+
+            self._entities   = self._entities.select(uids)
+            self._properties = None
+            self._t_start    = None
+            self._t_stop     = None
+            self._ttc        = None
+
+            self._changed()
+
+        return self
 
 
 # ------------------------------------------------------------------------------
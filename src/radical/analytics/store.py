@@ -0,0 +1,637 @@
+
+import json
+
+import numpy         as np
+import pandas        as pd
+
+import radical.utils as ru
+
+
+# profile fields which are stored as integer codes into a per-field vocabulary
+# (all fields but `ru.TIME`, which is kept as float64 column)
+CODED = [ru.EVENT, ru.COMP, ru.TID, ru.UID, ru.STATE, ru.MSG, ru.ENTITY]
+
+
+# ------------------------------------------------------------------------------
+#
+def in_ranges(times, ranges):
+    '''
+    Vectorized version of `ru.in_range()`: return a boolean mask which is
+    `True` for all `times` which fall into any of the given `ranges` (a single
+    `[start, stop]` pair or a list of such pairs, bounds inclusive).
+    '''
+
+    times = np.asarray(times, dtype=np.float64)
+
+    if ranges is None or not len(ranges):
+        return np.zeros(len(times), dtype=bool)
+
+    if not isinstance(ranges[0], (list, tuple)):
+        ranges = [ranges]
+
+    ret = np.zeros(len(times), dtype=bool)
+    for r in ranges:
+        ret |= (times >= r[0]) & (times <= r[1])
+
+    return ret
+
+
+# ------------------------------------------------------------------------------
+#
+def as_conditions(events):
+    '''
+    Convert an event specification (a single event tuple or dict, or a list of
+    those) into a list of event condition tuples.  Dict keys are profile field
+    indexes, all fields not set in a dict are not matched.
+    '''
+
+    if not events:
+        return []
+
+    ret = list()
+    if not isinstance(events, list):
+        events = [events]
+
+    for e in events:
+        if isinstance(e,dict):
+            et = ru.PROF_KEY_MAX * [None]
+            for k,v in list(e.items()):
+                et[k] = v
+            ret.append(tuple(et))
+        else:
+            ret.append(e)
+
+    return ret
+
+
+# ------------------------------------------------------------------------------
+#
+def state_condition(state):
+    '''
+    Return the event condition tuple which matches transitions into `state`.
+    '''
+
+    et = ru.PROF_KEY_MAX * [None]
+    et[ru.STATE] = state
+    et[ru.EVENT] = 'state'
+    return tuple(et)
+
+
+# ------------------------------------------------------------------------------
+#
+def range_conditions(state=None, event=None):
+    '''
+    Compile the initial and final conditions of a range specification (see
+    `Entity.ranges()`) into two lists of event condition tuples.
+    '''
+
+    event = as_conditions(event)
+
+    if not state: state = [[], []]
+    if not event: event = [[], []]
+
+    conds_init  = list()
+    conds_final = list()
+
+    for conds, states, events in [(conds_init,  state[0], event[0]),
+                                  (conds_final, state[1], event[1])]:
+
+        if not isinstance(states, list): states = [states]
+        if not isinstance(events, list): events = [events]
+
+        for s in states:
+            conds.append(state_condition(s))
+
+        conds.extend(as_conditions(events))
+
+    return conds_init, conds_final
+
+
+# ------------------------------------------------------------------------------
+#
+def _factorize(values):
+    '''
+    Return integer codes for the given values, and the vocabulary of distinct
+    values in order of first appearance.
+    '''
+
+    codes, uniq = pd.factorize(values, use_na_sentinel=False)
+
+    return codes.astype(np.int32), [None if (isinstance(v, float) and v != v)
+                                         else v for v in uniq]
+
+
+# ------------------------------------------------------------------------------
+#
+def encode(profile):
+    '''
+    Encode a list of profile events into columns: returns a tuple `(time,
+    codes, vocab)` where `time` is a float64 array of event times, and `codes`
+    and `vocab` map the coded profile fields to int32 code arrays and to the
+    vocabulary of distinct values (in order of first appearance), respectively.
+    '''
+
+    if not len(profile):
+        data = np.empty((0, ru.PROF_KEY_MAX), dtype=object)
+
+    else:
+        data = np.array(profile, dtype=object)
+        if data.ndim != 2 or data.shape[1] != ru.PROF_KEY_MAX:
+            # ragged rows - pad them to the full profile width
+            data = np.array([list(row)[:ru.PROF_KEY_MAX] +
+                             [None] * (ru.PROF_KEY_MAX - len(row))
+                             for row in profile], dtype=object)
+
+    time  = data[:, ru.TIME].astype(np.float64)
+    codes = dict()
+    vocab = dict()
+
+    for col in CODED:
+        codes[col], vocab[col] = _factorize(data[:, col])
+
+    return time, codes, vocab
+
+
+# ------------------------------------------------------------------------------
+#
+def merge(parts, shifts=None):
+    '''
+    Merge several encoded profiles (see `encode()`) into one, after shifting
+    the event times of each part by the respective value in `shifts`.  The
+    resulting events are (stably) sorted by time, and the vocabularies are
+    ordered by first appearance, so the result is the same as encoding the
+    merged and time sorted profile.
+    '''
+
+    if not parts:
+        return encode([])
+
+    if shifts is None:
+        shifts = [0.0] * len(parts)
+
+    time  = np.concatenate([part[0] + shift
+                            for part, shift in zip(parts, shifts)])
+    order = np.argsort(time, kind='stable')
+    codes = dict()
+    vocab = dict()
+
+    for col in CODED:
+
+        # map all part codes into the (deduplicated) merged vocabulary
+        merged, uniq = _factorize(np.array([v for part in parts
+                                              for v in part[2][col]],
+                                           dtype=object))
+        bounds = np.cumsum([0] + [len(part[2][col]) for part in parts])
+        found  = np.concatenate([merged[bounds[i]:bounds[i + 1]][part[1][col]]
+                                 for i, part in enumerate(parts)])[order]
+
+        # renumber codes by first appearance
+        codes[col], vocab[col] = _factorize(found)
+        vocab[col] = [uniq[c] for c in vocab[col]]
+
+    return time[order], codes, vocab
+
+
+# ------------------------------------------------------------------------------
+#
+class EventStore(object):
+
+    # --------------------------------------------------------------------------
+    #
+    def __init__(self, profile, grouped=True):
+        '''
+        Columnar representation of a list of profile events.
+
+        Event times are stored in a single float64 array, all other profile
+        fields are stored as int32 arrays of codes into a per-field vocabulary
+        of distinct values.  If `grouped` is set (default), the events are
+        sorted by entity (in order of first appearance of the entity uid in the
+        profile) and then by time, so that the events of any entity form
+        a contiguous slice `[offsets[eid], offsets[eid + 1])` of all columns.
+        Otherwise all events are only sorted by time and form a single slice.
+
+        Sorting is stable, so events with identical timestamps retain their
+        profile order.
+        '''
+
+        self._setup(*encode(profile), grouped=grouped)
+
+
+    # --------------------------------------------------------------------------
+    #
+    @staticmethod
+    def from_columns(time, codes, vocab, grouped=True):
+        '''
+        Create an event store from an encoded profile (see `encode()` and
+        `merge()`).
+        '''
+
+        ret = EventStore.__new__(EventStore)
+        ret._setup(time, codes, vocab, grouped=grouped)
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _setup(self, time, codes, vocab, grouped):
+
+        self._time   = time
+        self._codes  = codes
+        self._vocab  = vocab
+        self._tzero  = 0.0
+        self._lookup = dict()
+        self._hits   = dict()
+        self._order  = None
+        self._sorted = None
+
+        # FIXME: this should be phased out
+        self._rename(ru.EVENT, lambda v: isinstance(v, str) and v in 'advance',
+                     'state')
+
+        if grouped:
+            order = np.lexsort((self._time, self._codes[ru.UID]))
+        else:
+            order = np.argsort(self._time, kind='stable')
+
+        self._time = self._time[order]
+        for col in CODED:
+            self._codes[col] = self._codes[col][order]
+
+        if grouped:
+            self._uids    = list(self._vocab[ru.UID])
+            self._offsets = np.searchsorted(self._codes[ru.UID],
+                                            np.arange(len(self._uids) + 1))
+        else:
+            self._uids    = [None]
+            self._offsets = np.array([0, len(self._time)])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __getstate__(self):
+
+        return {'time'   : self._time,
+                'codes'  : self._codes,
+                'vocab'  : self._vocab,
+                'uids'   : self._uids,
+                'offsets': self._offsets,
+                'tzero'  : self._tzero}
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __setstate__(self, state):
+
+        self._time    = state['time']
+        self._codes   = state['codes']
+        self._vocab   = state['vocab']
+        self._uids    = state['uids']
+        self._offsets = state['offsets']
+        self._tzero   = state.get('tzero', 0.0)
+        self._lookup  = dict()
+        self._hits    = dict()
+        self._order   = None
+        self._sorted  = None
+
+
+    # --------------------------------------------------------------------------
+    #
+    def save(self, path):
+        '''
+        Store the event columns as `.npy` files in the directory `path`, and the
+        vocabularies as JSON file.  See `load()`.
+        '''
+
+        np.save('%s/time.npy'    % path, self._time)
+        np.save('%s/offsets.npy' % path, self._offsets)
+
+        for col in CODED:
+            np.save('%s/codes.%d.npy' % (path, col), self._codes[col])
+
+        with open('%s/store.json' % path, 'w') as fout:
+            json.dump({'vocab': {str(col): self._vocab[col] for col in CODED},
+                       'uids' : self._uids,
+                       'tzero': self._tzero}, fout)
+
+
+    # --------------------------------------------------------------------------
+    #
+    @staticmethod
+    def load(path, mmap_mode='r'):
+        '''
+        Load an event store from the directory `path` (see `save()`).  By
+        default, the event columns are memory mapped read-only, so that only
+        those parts of the columns are paged in which are actually accessed.
+        '''
+
+        with open('%s/store.json' % path, 'r') as fin:
+            data = json.load(fin)
+
+        state = {'time'   : np.load('%s/time.npy'    % path,
+                                    mmap_mode=mmap_mode),
+                 'offsets': np.load('%s/offsets.npy' % path),
+                 'codes'  : {col: np.load('%s/codes.%d.npy' % (path, col),
+                                          mmap_mode=mmap_mode)
+                                  for col in CODED},
+                 'vocab'  : {col: data['vocab'][str(col)] for col in CODED},
+                 'uids'   : data['uids'],
+                 'tzero'  : data.get('tzero', 0.0)}
+
+        # plain array views on the memory maps avoid the `np.memmap` overhead
+        # on element access
+        if mmap_mode:
+            state['time']  = np.asarray(state['time'])
+            state['codes'] = {col: np.asarray(codes)
+                              for col, codes in state['codes'].items()}
+
+        ret = EventStore.__new__(EventStore)
+        ret.__setstate__(state)
+
+        return ret
+
+
+    # --------------------------------------------------------------------------
+    #
+    def __len__(self):
+        return len(self._time)
+
+    @property
+    def time(self):
+        # raw event times, *not* corrected for `tzero` (see `times()`)
+        return self._time
+
+    @property
+    def tzero(self):
+        return self._tzero
+
+    @property
+    def uids(self):
+        return self._uids
+
+    @property
+    def offsets(self):
+        return self._offsets
+
+    @property
+    def nbytes(self):
+        return self._time.nbytes + sum(c.nbytes for c in self._codes.values())
+
+
+    # --------------------------------------------------------------------------
+    #
+    def _rename(self, col, check, new):
+        '''
+        Replace all vocabulary values of the given column for which `check`
+        returns `True` by `new`, and merge the codes of duplicated values.
+        '''
+
+        vocab = self._vocab[col]
+        if not any(check(v) for v in vocab):
+            return
+
+        merged = dict()
+        remap  = np.empty(len(vocab), dtype=np.int32)
+        for idx, val in enumerate(vocab):
+            if check(val):
+                val = new
+            remap[idx] = merged.setdefault(val, len(merged))
+
+        self._vocab[col] = list(merged.keys())
+        self._codes[col] = remap[self._codes[col]]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def set_tzero(self, tzero):
+        '''
+        Shift all event times by `-tzero` seconds.  The time column itself is
+        never changed: the shift is applied whenever event times are read via
+        `times()` or `events()`.
+        '''
+
+        self._tzero = float(tzero)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def times(self, rows=slice(None)):
+        '''
+        Return the event times of the given rows (an index array or a slice),
+        corrected for `tzero`.
+        '''
+
+        if not self._tzero:
+            return self._time[rows]
+
+        return self._time[rows] - self._tzero
+
+
+    # --------------------------------------------------------------------------
+    #
+    def window(self, ranges, begin=None, end=None):
+        '''
+        Return the sorted indexes of all rows with event times (corrected for
+        `tzero`) in any of the given time `ranges` (see `in_ranges()`).
+
+        If a row slice `[begin, end)` is given, only that slice is searched, and
+        its events are expected to be time sorted (as the events of an entity
+        are).  Otherwise the rows are looked up in a time index over all events
+        which is created on first use.  Either way the rows are found by
+        bisection, so the costs of a lookup do not depend on the number of
+        events outside of the time ranges.
+        '''
+
+        if ranges is None or not len(ranges):
+            return np.zeros(0, dtype=np.int64)
+
+        if not isinstance(ranges[0], (list, tuple)):
+            ranges = [ranges]
+
+        if begin is None:
+            if self._order is None:
+                self._order  = np.argsort(self._time, kind='stable')
+                self._sorted = self._time[self._order]
+            times = self._sorted
+
+        else:
+            if end is None:
+                end = len(self._time)
+            times = self._time[begin:end]
+
+        found = list()
+        for r in ranges:
+
+            # the range bounds are shifted by tzero here, whereas `times()`
+            # shifts the event times - the results may differ by rounding, so
+            # we search with some slack and check the candidates below
+            lo, hi = r[0] + self._tzero, r[1] + self._tzero
+            if self._tzero:
+                slack = 4 * np.spacing(abs(lo) + abs(hi) + abs(self._tzero))
+                lo, hi = lo - slack, hi + slack
+
+            first = int(np.searchsorted(times, lo, side='left'))
+            last  = int(np.searchsorted(times, hi, side='right'))
+
+            if first >= last:
+                continue
+
+            if begin is None: found.append(self._order[first:last])
+            else            : found.append(np.arange(first, last) + begin)
+
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+
+        rows = np.unique(np.concatenate(found))
+
+        if self._tzero:
+            rows = rows[in_ranges(self.times(rows), ranges)]
+
+        return rows
+
+
+    # --------------------------------------------------------------------------
+    #
+    def codes(self, col):
+        return self._codes[col]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def vocab(self, col):
+        return self._vocab[col]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def code(self, col, value):
+        '''
+        Return the code for the given value of the given column, or `-1` if that
+        value does not appear in the store.
+        '''
+
+        if col not in self._lookup:
+            self._lookup[col] = {v: i for i, v in enumerate(self._vocab[col])}
+
+        return self._lookup[col].get(value, -1)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def span(self, eid):
+        '''
+        Return the `[begin, end)` row slice for the entity with the given index.
+        '''
+
+        return self._offsets.item(eid), self._offsets.item(eid + 1)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def rows(self, eids):
+        '''
+        Return the concatenated row indexes of all given entities.
+        '''
+
+        eids   = np.asarray(eids, dtype=np.int64)
+        begins = self._offsets[eids]
+        sizes  = self._offsets[eids + 1] - begins
+
+        if not len(sizes):
+            return np.zeros(0, dtype=np.int64)
+
+        # shift a running row counter by the begin of each entity slice
+        shifts = np.repeat(begins - np.cumsum(sizes) + sizes, sizes)
+
+        return np.arange(int(sizes.sum())) + shifts
+
+
+    # --------------------------------------------------------------------------
+    #
+    def events(self, begin=0, end=None):
+        '''
+        Materialize the given row slice as list of profile event tuples.
+        '''
+
+        if end is None:
+            end = len(self._time)
+
+        cols = [None] * ru.PROF_KEY_MAX
+        cols[ru.TIME] = self.times(slice(begin, end)).tolist()
+
+        for col in CODED:
+            vocab     = self._vocab[col]
+            cols[col] = [vocab[c] for c in self._codes[col][begin:end].tolist()]
+
+        return list(zip(*cols))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def isin(self, col, values, begin=0, end=None):
+        '''
+        Return a boolean mask over the given row slice which is `True` where the
+        value of column `col` is one of the given `values`.
+        '''
+
+        codes = [self.code(col, v) for v in ru.as_list(values)]
+        codes = [c for c in codes if c >= 0]
+
+        return np.isin(self._codes[col][begin:end], codes)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def match(self, cond, begin=0, end=None, rows=None, skip=None):
+        '''
+        Return a boolean mask over the given row slice which is `True` where the
+        event matches the given condition.  The condition is an event tuple
+        where `None` fields are ignored, the `ru.MSG` field is matched as
+        substring, and all other fields must match exactly.  The last field
+        (`ru.ENTITY`) is never matched.
+
+        If `rows` is given, the mask is computed over those row indexes instead
+        of the row slice.  Fields listed in `skip` are not matched (the caller
+        has already checked them).
+        '''
+
+        if rows is not None:
+            sel = rows
+            num = len(rows)
+
+        else:
+            if end is None:
+                end = len(self._time)
+            sel = slice(begin, end)
+            num = end - begin
+
+        mask = np.ones(num, dtype=bool)
+
+        for key in range(min(len(cond), ru.PROF_KEY_MAX - 1)):
+
+            if not mask.any():
+                break
+
+            val = cond[key]
+            if val is None or (skip and key in skip):
+                continue
+
+            if key == ru.TIME:
+                mask &= self.times(sel) == val
+
+            elif key == ru.MSG:
+                # cache a lookup table of all messages containing `val`
+                if val not in self._hits:
+                    self._hits[val] = np.array([v is not None and val in v
+                                                for v in self._vocab[ru.MSG]],
+                                               dtype=bool)
+                mask &= self._hits[val][self._codes[key][sel]]
+
+            else:
+                mask &= self._codes[key][sel] == self.code(key, val)
+
+        return mask
+
+
+# ------------------------------------------------------------------------------
+
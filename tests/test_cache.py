@@ -0,0 +1,118 @@
+
+import os
+import glob
+import pytest
+
+import radical.analytics as ra
+
+from radical.analytics import cache
+
+
+# ------------------------------------------------------------------------------
+#
+@pytest.fixture
+def src(tmp_path, monkeypatch):
+    """Fixture to get a session source directory and a private cache"""
+
+    monkeypatch.setenv('RADICAL_BASE', str(tmp_path / 'base'))
+
+    src = tmp_path / 'session.0000'
+    src.mkdir()
+    with open(src / 'comp.0000.prof', 'w') as fout:
+        fout.write('#time,event,comp,thread,uid,state,msg\n')
+        fout.write('0.0000,sync_abs,comp,T,,,host:127.0.0.1:0.0:0.0:sys\n')
+        fout.write('1.0000,state,tmgr,T,task.000000,NEW,\n')
+        fout.write('2.0000,state,tmgr,T,task.000000,DONE,\n')
+
+    return str(src)
+
+
+# ------------------------------------------------------------------------------
+#
+class TestCache(object):
+
+    # --------------------------------------------------------------------------
+    #
+    def test_fingerprint(self, src):
+        """Fingerprints change with the source files and session type"""
+
+        key = cache.fingerprint(src, 'radical')
+
+        assert cache.fingerprint(src, 'radical')       == key
+        assert cache.fingerprint(src, 'radical.pilot') != key
+
+        # same size, new mtime
+        fname = os.path.join(src, 'comp.0000.prof')
+        stat  = os.stat(fname)
+        os.utime(fname, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert cache.fingerprint(src, 'radical') != key
+
+        # same size and mtime, new content
+        key  = cache.fingerprint(src, 'radical', fast_hash=True)
+        stat = os.stat(fname)
+        with open(fname, 'rb+') as fout:
+            fout.seek(-4, os.SEEK_END)
+            fout.write(b'LED\n')
+        os.utime(fname, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert cache.fingerprint(src, 'radical')                 != \
+               cache.fingerprint(src, 'radical', fast_hash=True)
+        assert cache.fingerprint(src, 'radical', fast_hash=True) != key
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_create(self, src):
+        """Sessions are cached until their source changes"""
+
+        s1 = ra.Session.create(src, 'radical')
+        s2 = ra.Session.create(src, 'radical')
+
+        assert s1 is not s2
+        assert s2.list('state') == s1.list('state')
+
+        fname = os.path.join(src, 'comp.0001.prof')
+        with open(fname, 'w') as fout:
+            fout.write('#time,event,comp,thread,uid,state,msg\n')
+            fout.write('0.0000,sync_abs,comp,T,,,host:127.0.0.1:0.0:0.0:sys\n')
+            fout.write('3.0000,state,tmgr,T,task.000001,NEW,\n')
+
+        s3 = ra.Session.create(src, 'radical')
+        assert len(s3.get(etype='task')) == 2
+        assert len(glob.glob(cache.get_cache().get_path(s3.uid, '*'))) == 2
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_evict(self, src, tmp_path):
+        """Least recently used, unpinned entries are evicted over budget"""
+
+        session = ra.Session(src, 'radical')
+        store   = cache.Cache(base=str(tmp_path / 'cache'), budget=0)
+        paths   = [store.get_path('s%d' % i, 'key') for i in range(4)]
+
+        for i, path in enumerate(paths):
+            _, cached = store.get(path, lambda: session)
+            assert not cached
+            os.utime(path, (i, i))
+
+        _, cached = store.get(paths[0], lambda: None)
+        assert cached
+        assert store.hits == 1 and store.misses == 4
+
+        # s0 was just used, s1 is pinned - evict s2 and s3
+        size = store.entries()[0]['size']
+        store.pin(paths[1])
+        assert store.evict(budget=size * 2.5) == size * 2
+        assert [e['sid'] for e in store.entries()] == ['s1', 's0']
+        assert [e['pinned'] for e in store.entries()] == [True, False]
+
+        assert store.purge() == size
+        assert [e['sid'] for e in store.entries()] == ['s1']
+
+        store.unpin(paths[1])
+        store.purge(sid='s1')
+        assert store.stats()['entries'] == 0
+
+
+# ------------------------------------------------------------------------------
+
@@ -0,0 +1,85 @@
+
+from radical.analytics import compute
+
+
+# ------------------------------------------------------------------------------
+#
+class TestCompute(object):
+
+    # --------------------------------------------------------------------------
+    #
+    def test_concurrency(self):
+        """Concurrency changes at range boundaries, starting at zero"""
+
+        times, values = compute.concurrency([0.0, 1.0, 1.0], [2.0, 3.0, 1.0])
+
+        assert compute.as_series(times, values) == [[0.0, 0], [0.0, 1],
+                                                    [1.0, 2], [2.0, 1],
+                                                    [3.0, 0]]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_concurrency_sampling(self):
+        """Samples report the concurrency right before the sample time"""
+
+        times, values = compute.concurrency([0.0, 1.0], [2.0, 3.0],
+                                            sampling=1.0)
+
+        assert compute.as_series(times, values) == [[0.0, 0], [1.0, 1],
+                                                    [2.0, 2], [3.0, 1],
+                                                    [4.0, 0]]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_concurrency_empty(self):
+        """No ranges result in an empty time series"""
+
+        times, values = compute.concurrency([], [], sampling=1.0)
+
+        assert compute.as_series(times, values) == []
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_rate(self):
+        """Rates are computed between consecutive distinct timestamps"""
+
+        times, rates = compute.rate([0.0, 0.0, 1.0, 3.0, 3.0])
+
+        assert compute.as_series(times, rates) == [[1.0, 3.0], [3.0, 1.0]]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_rate_sampling(self):
+        """Rates are computed per sampling window, up to the last timestamp"""
+
+        times, rates = compute.rate([0.0, 0.5, 1.0, 2.5], sampling=1.0)
+
+        assert compute.as_series(times, rates) == [[1.0, 3.0], [2.0, 0.0],
+                                                   [2.5, 2.0]]
+
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_collapse(self):
+        """Overlapping ranges are merged per group, empty ones are ignored"""
+
+        starts, stops, groups = compute.collapse([3.0, 0.0, 1.0, 5.0, 6.0, 0.0],
+                                                 [4.0, 2.0, 3.0, 5.0, 7.0, 9.0],
+                                                 [0,   0,   0,   0,   1,   2  ])
+
+        assert starts.tolist() == [0.0, 6.0, 0.0]
+        assert stops.tolist()  == [4.0, 7.0, 9.0]
+        assert groups.tolist() == [0,   1,   2  ]
+
+        starts, stops, _ = compute.collapse([2.0, 0.0], [2.0, 1.0])
+        assert starts.tolist() == [0.0]
+        assert stops.tolist()  == [1.0]
+
+
+# ------------------------------------------------------------------------------
+
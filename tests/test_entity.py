@@ -34,6 +34,29 @@ def range_entity():
         return entity
 
 
+# ------------------------------------------------------------------------------
+#
+@pytest.fixture
+def index_entity():
+    """Fixture to get an entity with repeated events and states"""
+
+    rows = [(1.0, 'state',        'tmgr',    'NEW',       ''),
+            (2.0, 'schedule_try', 'agent',   '',          'try 1'),
+            (3.0, 'schedule_try', 'agent',   '',          'try 2'),
+            (3.5, 'schedule_ok',  'agent',   '',          ''),
+            (3.9, 'state',        'agent',   'EXECUTING', ''),
+            (4.0, 'state',        'agent',   'EXECUTING', ''),
+            (4.5, 'exec_start',   'agent',   '',          ''),
+            (5.0, 'exec_start',   'agent',   '',          ''),
+            (6.0, 'exec_stop',    'agent',   '',          ''),
+            (6.5, 'exec_start',   'agent.1', '',          ''),
+            (7.0, 'exec_stop',    'agent.1', '',          ''),
+            (8.0, 'state',        'tmgr',    'DONE',      'final')]
+
+    return [(t, ev, comp, 'T', 'task.000000', st, msg, 'task')
+            for t, ev, comp, st, msg in rows]
+
+
 # ------------------------------------------------------------------------------
 #
 def get_states(events=None):
@@ -180,6 +203,30 @@ class TestEntity(object):
         assert e.events == events
 
 
+    # --------------------------------------------------------------------------
+    #
+    def test_timestamps(self, pilot_entity):
+        """Test timestamps constrained by time ranges"""
+        e = Entity(_uid=pilot_entity['uid'],
+                   _profile=pilot_entity['events'],
+                   _details=pilot_entity['details']
+                   )
+        events = sort_events(pilot_entity['events'])
+        t_mid  = events[len(events) // 2][ru.TIME]
+        window = [events[1][ru.TIME], t_mid]
+
+        # all events in the time range
+        assert e.timestamps(time=window) == \
+               [ev for ev in events if window[0] <= ev[ru.TIME] <= window[1]]
+
+        # matching events in any of the time ranges
+        times = e.timestamps(event={ru.EVENT: 'state'})
+        assert e.timestamps(event={ru.EVENT: 'state'},
+                            time=[window, [t_mid + 1, t_mid + 2]]) == \
+               [t for t in times if window[0] <= t <= window[1] or
+                                    t_mid + 1 <= t <= t_mid + 2]
+
+
     # --------------------------------------------------------------------------
     #
     def test_description(self, pilot_entity):
@@ -208,6 +255,38 @@ class TestEntity(object):
         assert e.cfg == pilot_entity['details']['cfg']
 
 
+    # --------------------------------------------------------------------------
+    #
+    def test_compact(self, pilot_entity):
+        """Entities have no instance dict, and reference their details"""
+        e = Entity(_uid=pilot_entity['uid'],
+                   _profile=pilot_entity['events'],
+                   _details=pilot_entity['details']
+                   )
+
+        assert not hasattr(e, '__dict__')
+        assert e.description is pilot_entity['details']['description']
+        assert e.cfg         is pilot_entity['details']['cfg']
+
+        # entities without details get their own dicts, which persist changes
+        details = dict()
+        e = Entity(_uid=pilot_entity['uid'],
+                   _profile=pilot_entity['events'],
+                   _details=details
+                   )
+        assert e.description == dict()
+        assert e.cfg         == {'hostid': None}
+        assert e.name        == pilot_entity['uid']
+
+        e.cfg['hostid']         = 'host.0000'
+        e.description['name']   = 'name'
+        e.resources['cpu']      = 1
+        assert e.cfg         == {'hostid': 'host.0000'}
+        assert e.description == {'name': 'name'}
+        assert e.resources   == {'cpu': 1}
+        assert details       == dict()
+
+
     # --------------------------------------------------------------------------
     #
     def test_consistency(self, pilot_entity):
@@ -784,5 +863,86 @@ class TestEntity(object):
         assert ranges == []
 
 
+
+    # --------------------------------------------------------------------------
+    #
+    def test_index_lookups(self, index_entity):
+        """Events and states are looked up in the entity's event index"""
+        e = Entity(_uid='task.000000', _profile=index_entity, _details={})
+
+        # exact event and state lookups - states are timed by their last
+        # transition
+        assert e.timestamps(event={ru.EVENT: 'exec_start'}) == [4.5, 5.0, 6.5]
+        assert e.timestamps(event={ru.STATE: 'EXECUTING'})  == [3.9, 4.0]
+        assert e.timestamps(state='EXECUTING')              == [4.0]
+        assert e.timestamps(state=['NEW', 'DONE'])          == [1.0, 8.0]
+        assert e.timestamps(event={ru.EVENT: 'no_such_event'}) == []
+        assert e.timestamps(state='NO_SUCH_STATE')             == []
+        assert 'index' in e._get_cache()
+
+        # combined event and state conditions
+        assert e.timestamps(event={ru.EVENT: 'state',
+                                   ru.STATE: 'EXECUTING'}) == [3.9, 4.0]
+        assert e.timestamps(event={ru.EVENT: 'state',
+                                   ru.STATE: 'DONE'})      == [8.0]
+        assert e.timestamps(event={ru.EVENT: 'exec_start',
+                                   ru.STATE: 'EXECUTING'}) == []
+
+        # other condition fields are checked on the looked up events
+        assert e.timestamps(event={ru.EVENT: 'exec_start',
+                                   ru.COMP : 'agent.1'})   == [6.5]
+        assert e.timestamps(event={ru.STATE: 'DONE',
+                                   ru.MSG  : 'fin'})       == [8.0]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_index_scan(self, index_entity):
+        """Conditions without event or state fall back to a scan"""
+        e = Entity(_uid='task.000000', _profile=index_entity, _details={})
+
+        # message conditions match substrings
+        assert e.timestamps(event={ru.MSG: 'try'})   == [2.0, 3.0]
+        assert e.timestamps(event={ru.MSG: 'try 2'}) == [3.0]
+        assert e.timestamps(event={ru.COMP: 'agent.1',
+                                   ru.MSG : ''})     == [6.5, 7.0]
+        assert e.timestamps(event={ru.MSG: 'nope'})  == []
+
+        # no index is built for scans
+        assert 'index' not in e._get_cache()
+
+        assert e.ranges(event=[{ru.MSG: 'try'}, {ru.EVENT: 'exec_stop'}],
+                        collapse=False) == [[2.0, 6.0]]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_index_ranges(self, index_entity):
+        """Ranges start at the first of repeated initial events"""
+        e = Entity(_uid='task.000000', _profile=index_entity, _details={})
+
+        event = [{ru.EVENT: 'exec_start'}, {ru.EVENT: 'exec_stop'}]
+
+        # the repeated initial event at 5.0 does not start a new range
+        assert e.ranges(event=event, collapse=False) == [[4.5, 6.0],
+                                                         [6.5, 7.0]]
+        assert e.ranges(event=event, expand=True)    == [[4.5, 7.0]]
+        assert e.ranges(event=event, time=[5.5, 6.8]) == [[5.5, 6.0],
+                                                          [6.5, 6.8]]
+
+        # initial and final conditions can match the same events
+        assert e.ranges(event=[{ru.EVENT: 'exec_start'},
+                               {ru.EVENT: 'exec_start'}],
+                        collapse=False) == [[4.5, 5.0]]
+
+        # states and events are combined
+        assert e.ranges(state=['NEW', 'DONE']) == [[1.0, 8.0]]
+        assert e.ranges(state=[['NEW'], []],
+                        event=[[], {ru.EVENT: 'schedule_ok'}]) == [[1.0, 3.5]]
+        assert e.ranges(event=[{ru.EVENT: 'exec_stop'},
+                               {ru.EVENT: 'exec_start'}],
+                        collapse=False) == [[6.0, 6.5]]
+
+
 # ------------------------------------------------------------------------------
 
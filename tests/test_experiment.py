@@ -0,0 +1,251 @@
+
+import pytest
+
+import numpy as np
+
+import radical.analytics as ra
+
+
+# ------------------------------------------------------------------------------
+#
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    """Fixture to get the source paths of some small sessions (private cache)"""
+
+    monkeypatch.setenv('RADICAL_BASE', str(tmp_path / 'base'))
+
+    ret = list()
+    for idx in range(3):
+
+        src = tmp_path / ('rp.session.%04d' % idx)
+        src.mkdir()
+
+        with open(src / 'comp.0000.prof', 'w') as fout:
+            fout.write('#time,event,comp,thread,uid,state,msg\n')
+            for tid in range(idx + 1):
+                fout.write('%.4f,state,tmgr,T,task.%06d,NEW,\n'
+                           % (tid + 1.0, tid))
+                fout.write('%.4f,exec_start,agent,T,task.%06d,,\n'
+                           % (tid + 1.5, tid))
+                fout.write('%.4f,exec_stop,agent,T,task.%06d,,\n'
+                           % (2 * tid + 2.5, tid))
+
+        ret.append(str(src))
+
+    return ret
+
+
+# ------------------------------------------------------------------------------
+#
+class TestExperiment(object):
+
+    def test_create(self, sources):
+        """Sessions are created in order, with and without a process pool"""
+
+        serial   = ra.Experiment(sources, stype='radical')
+        parallel = ra.Experiment(sources, stype='radical', workers=2)
+
+        assert serial.sids == parallel.sids == \
+               ['rp.session.%04d' % idx for idx in range(3)]
+        assert [len(s.get(etype='task')) for s in parallel.sessions] == \
+               [1, 2, 3]
+        assert not parallel.errors
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_errors(self, sources, tmp_path):
+        """Sessions which cannot be created are skipped and reported"""
+
+        missing = str(tmp_path / 'missing')
+        exp     = ra.Experiment([missing] + sources[1:], stype='radical',
+                                workers=2)
+
+        assert exp.sids == ['rp.session.0001', 'rp.session.0002']
+        assert list(exp.errors) == [missing]
+        assert isinstance(exp.errors[missing], ValueError)
+
+        with pytest.raises(RuntimeError):
+            ra.Experiment([missing], stype='radical', workers=2)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_lazy(self, sources):
+        """Lazy experiments load sessions on access, within a memory budget"""
+
+        exp      = ra.Experiment(sources, stype='radical', lazy=True, budget=1)
+        sessions = exp.sessions
+
+        assert exp.sids == ['rp.session.%04d' % idx for idx in range(3)]
+        assert sessions.loaded == []
+
+        assert len(sessions[1].get(etype='task')) == 2
+        assert sessions[1] is sessions[1]
+        assert sessions.loaded == [1]
+
+        # the least recently used session is dropped when over budget
+        assert [len(s.get(etype='task')) for s in sessions] == [1, 2, 3]
+        assert sessions.loaded == [2]
+
+        # changed sessions are kept, as they differ from their snapshots
+        sessions[0].filter(uid='task.000000', inplace=False)
+        sessions[1].filter(uid='task.000000', inplace=True)
+        times = sessions[2].timestamps(state='NEW')
+        sessions[2].tzero(1.0)
+        assert sessions.loaded == [1, 2]
+
+        assert [len(s.get(etype='task')) for s in sessions] == [1, 1, 3]
+        assert sessions.loaded == [0, 1, 2]
+        assert sessions[2].timestamps(state='NEW') == [t - 1.0 for t in times]
+
+        with pytest.raises(ValueError):
+            ra.Experiment(list(sessions), lazy=True)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_runs(self, sources):
+        """Sessions are grouped into runs for statistics over sessions"""
+
+        exp  = ra.Experiment(sources, stype='radical')
+        runs = exp.runs({'rp.session.0000': 'a',
+                         'rp.session.0002': 'a',
+                         'rp.session.0001': 'b'})
+
+        assert list(runs) == ['a', 'b']
+        assert runs['a'].sids == ['rp.session.0000', 'rp.session.0002']
+
+        run   = runs['a']
+        event = [{1: 'exec_start'}, {1: 'exec_stop'}]
+        assert list(run.ttc()) == [1.5, 5.5]
+        assert list(run.peaks(event=event)) == [1, 2]
+        assert np.isnan(run.peaks(event=[{1: 'x'}, {1: 'y'}])).all()
+
+        durations = run.durations({'exec': event, 'none': [{1: 'x'}, {1: 'y'}]})
+        assert list(durations['exec']) == [1.0, 2.0]
+        assert np.isnan(durations['none']).all()
+
+        stats = run.stats(durations)
+        assert stats['exec'] == {'n': 2, 'mean': 1.5, 'std': 0.5,
+                                 'min': 1.0, 'max': 2.0, 'median': 1.5}
+        assert stats['none']['n'] == 0
+        assert np.isnan(stats['none']['mean'])
+
+        # keys can also be computed from the sessions
+        runs = exp.runs(lambda s: len(s.get(etype='task')) > 1)
+        assert [r.sids for r in runs.values()] == [['rp.session.0000'],
+                                                   ['rp.session.0001',
+                                                    'rp.session.0002']]
+
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_utilization(self, sources, monkeypatch):
+        """Session resources are computed in a pool and cached"""
+
+        calls = list()
+
+        def get_resources(session, rtype='cpu', udurations=None):
+            calls.append(session.uid)
+            n = len(session.get(etype='task'))
+            return ({'total': {'pilot.0000': [[0.0, 10.0, 0, 3]]}},
+                    {'exec' : {'task.000000': [[0.0, 2.0 * n, 0, 0]]},
+                     'boot' : {'pilot.0000' : [[0.0, 1.0, 0, 3]]}})
+
+        monkeypatch.setattr(ra.Session, '_get_resources', get_resources)
+
+        exp = ra.Experiment(sources, stype='radical')
+        _, _, _, rel, info = exp.utilization(['exec'])
+
+        assert rel['rp.session.0001'] == {'total': 100.0, 'exec': 10.0,
+                                          'Other': 90.0}
+        assert info['rp.session.0002'].startswith('rp.session.0002 [3]')
+        assert len(calls) == 3
+
+        # other metrics reuse the cached resources
+        _, _, _, rel, _ = exp.utilization([['all', ['exec', 'boot']]])
+        assert rel['rp.session.0001']['all'] == 20.0
+        assert len(calls) == 3
+
+        # runs share the cached resources
+        run = exp.runs(lambda s: 'all')['all']
+        assert list(run.utilization(['exec'])['exec']) == [5.0, 10.0, 15.0]
+        assert len(calls) == 3
+
+        # sessions changed in place get their resources computed again
+        exp.sessions[1].filter(uid='task.000000', inplace=True)
+        _, _, _, rel, _ = exp.utilization(['exec'])
+        assert rel['rp.session.0001']['exec'] == 5.0
+        assert calls[3:] == ['rp.session.0001']
+
+        exp.sessions[2].tzero(1.0)
+        exp.utilization(['exec'])
+        assert calls[4:] == ['rp.session.0002']
+        exp.sessions[2].tzero(0.0)
+
+        parallel = ra.Experiment(sources, stype='radical', workers=2)
+        serial   = ra.Experiment(sources, stype='radical')
+        assert parallel.utilization(['exec']) == serial.utilization(['exec'])
+        assert len(calls) == 8
+
+        # ... also if they are loaded again and changed in another way
+        lazy = ra.Experiment(sources, stype='radical', lazy=True)
+        lazy.sessions[2].filter(uid=['task.000000', 'task.000001'],
+                                inplace=True)
+        _, _, _, rel, _ = lazy.utilization(['exec'])
+        assert rel['rp.session.0002']['exec'] == 10.0
+        assert len(calls) == 11
+
+        # reload the session (changed sessions are not dropped on budget)
+        del lazy.sessions._loaded[2]
+        lazy.sessions[2].filter(uid='task.000000', inplace=True)
+        _, _, _, rel, _ = lazy.utilization(['exec'])
+        assert rel['rp.session.0002']['exec'] == 5.0
+        assert calls[11:] == ['rp.session.0002']
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_queries(self, sources):
+        """Queries run on all sessions and return session labelled frames"""
+
+        exp   = ra.Experiment(sources, stype='radical')
+        event = [{1: 'exec_start'}, {1: 'exec_stop'}]
+
+        tasks = exp.get(etype='task', state='NEW', time=[1.5, 2.0])
+        assert tasks.sid.tolist() == ['rp.session.0001', 'rp.session.0002']
+        assert tasks.uid.tolist() == ['task.000001', 'task.000001']
+
+        ranges = exp.ranges(event=event, collapse=False)
+        assert (ranges.stop - ranges.start).tolist() == [1, 1, 2, 1, 2, 3]
+        assert ranges.groupby('sid').size().tolist() == [1, 2, 3]
+
+        times = exp.timestamps(event={1: 'exec_stop'}, etype='task')
+        assert times[times.sid == 'rp.session.0002'].time.tolist() == \
+               [2.5, 4.5, 6.5]
+
+        durations = exp.durations({'exec': event}, etype='task')
+        assert durations.columns.tolist() == ['sid', 'uid', 'exec']
+        assert durations.exec.max() == 3.0
+
+        # results do not depend on the process pool
+        for query, kwargs in [('get',         {'state': 'NEW'}),
+                              ('ranges',      {'event': event}),
+                              ('concurrency', {'event': event}),
+                              ('durations',   {'specs': {'exec': event}})]:
+            serial   = getattr(exp, query)(**kwargs)
+            parallel = getattr(exp, query)(workers=2, **kwargs)
+            assert serial.equals(parallel)
+
+        # changed sessions are passed on to the worker processes
+        exp.sessions[2].filter(uid='task.000000', inplace=True)
+        serial   = exp.get(state='NEW')
+        parallel = exp.get(state='NEW', workers=2)
+        assert serial.equals(parallel)
+        assert len(serial) == 4
+
+
+# ------------------------------------------------------------------------------
+
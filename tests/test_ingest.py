@@ -0,0 +1,157 @@
+
+import os
+import time
+import pytest
+import tarfile
+import threading
+import radical.utils as ru
+
+import concurrent.futures as cf
+
+from radical.analytics       import ingest
+from radical.analytics.store import EventStore
+
+
+# ------------------------------------------------------------------------------
+#
+@pytest.fixture
+def profiles(tmp_path):
+    """Fixture to get a set of profiles from two hosts with clock offsets"""
+
+    paths = list()
+    for idx, (host, t_sys, t_ntp) in enumerate([('a', 100.0, 100.0),
+                                                ('a', 100.0, 100.0),
+                                                ('b', 102.5, 100.0)]):
+        sub = tmp_path / ('dir.%d' % idx)
+        sub.mkdir()
+        path = str(sub / ('comp.%d.prof' % idx))
+        with open(path, 'w') as fout:
+            fout.write('#time,event,comp,thread,uid,state,msg\n')
+            fout.write('%.4f,sync_abs,c%d,T,,,%s:1.1.1.1:%.4f:%.4f:ntp\n'
+                       % (t_sys, idx, host, t_sys, t_ntp))
+            for i in range(10 * (idx + 1)):
+                fout.write('%.4f,state,c%d,T,task.%06d,NEW,\n'
+                           % (t_sys + i, idx, i))
+        paths.append(path)
+
+    return paths
+
+
+# ------------------------------------------------------------------------------
+#
+class TestIngest(object):
+
+    # --------------------------------------------------------------------------
+    #
+    def test_find_profiles(self, profiles, tmp_path):
+        """Profiles are found once in the whole directory tree"""
+
+        assert ingest.find_profiles(str(tmp_path)) == sorted(profiles)
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_get_shards(self, profiles):
+        """Shards are balanced by file size and retain the file order"""
+
+        shards = ingest.get_shards(profiles, 2)
+        assert shards == [[profiles[2]], profiles[:2]]
+
+        # larger shards come first
+        assert ingest.get_shards(profiles, 5) == [[p] for p in profiles[::-1]]
+
+
+    # --------------------------------------------------------------------------
+    #
+    @pytest.mark.parametrize('nproc', [1, 2])
+    def test_read_profiles(self, profiles, nproc, monkeypatch):
+        """Parsed profiles match the combined profile, also when parallel"""
+
+        monkeypatch.setattr(ingest, '_PARALLEL_MIN_SIZE', 0)
+
+        store, _         = ingest.read_profiles(profiles, 'sid', nproc=nproc)
+        profile, accuracy = ru.combine_profiles(
+                                        ru.read_profiles(profiles, sid='sid'))
+        expected = EventStore(profile)
+
+        assert accuracy == 0.0
+        assert store.uids == expected.uids
+        assert store.events() == expected.events()
+
+        # clock offsets are applied: host 'b' is 2.5 seconds ahead
+        assert min(store.time) == 0.0
+        assert max(store.time) == 29.0
+
+
+    # --------------------------------------------------------------------------
+    #
+    @pytest.mark.parametrize('nproc', [1, 2])
+    def test_read_tarball(self, profiles, nproc, tmp_path, monkeypatch):
+        """Tarballs are read without extracting them"""
+
+        monkeypatch.setattr(ingest, '_PARALLEL_MIN_SIZE', 0)
+
+        tgz = str(tmp_path / 'session.tgz')
+        with tarfile.open(tgz, 'w:gz') as tar:
+            for path in profiles:
+                tar.add(path, arcname=os.path.relpath(path, str(tmp_path)))
+
+        store,    _ = ingest.read_tarball(tgz, 'sid', nproc=nproc)
+        expected, _ = ingest.read_profiles(profiles, 'sid')
+
+        assert store.uids     == expected.uids
+        assert store.events() == expected.events()
+        assert sorted(os.listdir(str(tmp_path))) == ['dir.0', 'dir.1', 'dir.2',
+                                                     'session.tgz']
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_read_tarball_bounded(self, profiles, tmp_path, monkeypatch):
+        """Tarball members are not read ahead without bounds"""
+
+        monkeypatch.setattr(ingest, '_PARALLEL_MIN_SIZE', 0)
+        monkeypatch.setattr(ingest, '_QUEUE_SIZE', 1)
+
+        tgz = str(tmp_path / 'session.tgz')
+        with tarfile.open(tgz, 'w:gz') as tar:
+            for idx in range(8):
+                tar.add(profiles[0], arcname='comp.%d.prof' % idx)
+
+        # the pool holds at most `nproc + _QUEUE_SIZE` unparsed members
+        submitted = list()
+
+        class Pool(cf.ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                assert len([f for f in submitted if not f.done()]) < 3
+                submitted.append(super().submit(*args, **kwargs))
+                return submitted[-1]
+
+        parse = ingest.read_member
+
+        def read_member(name, data, sid):
+            time.sleep(0.05)
+            return parse(name, data, sid)
+
+        monkeypatch.setattr(ingest.cf, 'ProcessPoolExecutor', Pool)
+        monkeypatch.setattr(ingest, 'read_member', read_member)
+
+        store, _ = ingest.read_tarball(tgz, 'sid', nproc=2)
+        assert len(submitted) == 8
+        assert len(store.uids) == 11
+
+        # the reader thread is released when parsing fails
+        def fail(name, data, sid):
+            raise ValueError(name)
+
+        monkeypatch.setattr(ingest, 'read_member', fail)
+        threads = threading.active_count()
+
+        for nproc in [1, 2]:
+            with pytest.raises(ValueError):
+                ingest.read_tarball(tgz, 'sid', nproc=nproc)
+            assert threading.active_count() == threads
+
+
+# ------------------------------------------------------------------------------
+
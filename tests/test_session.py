@@ -1,4 +1,38 @@
 
+import pytest
+
+import numpy as np
+
+import radical.analytics as ra
+
+
+# ------------------------------------------------------------------------------
+#
+@pytest.fixture
+def session(tmp_path):
+    """Fixture to get a session from a small synthetic profile"""
+
+    rows = [(0.0, 'sync_abs',   'comp',  'T', '',            '',            ''),
+            (0.5, 'state',      'pmgr',  'T', 'pilot.0000',  'NEW',         ''),
+            (1.0, 'state',      'pmgr',  'T', 'pilot.0000',  'PMGR_ACTIVE', ''),
+            (1.0, 'state',      'tmgr',  'T', 'task.000000', 'NEW',         ''),
+            (2.0, 'exec_start', 'agent', 'T', 'task.000000', '',            ''),
+            (3.0, 'exec_stop',  'agent', 'T', 'task.000000', '',            ''),
+            (3.5, 'state',      'tmgr',  'T', 'task.000000', 'DONE',        ''),
+            (1.5, 'state',      'tmgr',  'T', 'task.000001', 'NEW',         ''),
+            (4.0, 'exec_start', 'agent', 'T', 'task.000001', '',            ''),
+            (6.0, 'exec_stop',  'agent', 'T', 'task.000001', '',            ''),
+            (6.5, 'state',      'tmgr',  'T', 'task.000001', 'FAILED',      ''),
+            (2.5, 'state',      'tmgr',  'T', 'task.000002', 'NEW',         ''),
+            (9.0, 'state',      'pmgr',  'T', 'pilot.0000',  'DONE',        '')]
+
+    with open(tmp_path / 'comp.0000.prof', 'w') as fout:
+        fout.write('#time,event,comp,thread,uid,state,msg\n')
+        for row in sorted(rows):
+            fout.write('%.4f,%s,%s,%s,%s,%s,%s\n' % row)
+
+    return ra.Session(str(tmp_path), 'radical')
+
 
 # ------------------------------------------------------------------------------
 #
@@ -9,5 +43,337 @@ class TestSession(object):
         assert True
 
 
+    # --------------------------------------------------------------------------
+    #
+    def test_get(self, session):
+        """Entities are selected by etype, state, event and uid"""
+
+        def uids(entities):
+            return [e.uid for e in entities]
+
+        assert uids(session.get(etype='task')) == ['task.000000',
+                                                   'task.000001',
+                                                   'task.000002']
+        assert uids(session.get(state='DONE')) == ['pilot.0000',
+                                                   'task.000000']
+        assert uids(session.get(etype='task', state=['DONE', 'FAILED'])) \
+                                               == ['task.000000',
+                                                   'task.000001']
+        assert uids(session.get(event='exec_start', time=[3.0, 5.0])) \
+                                               == ['task.000001']
+        assert uids(session.get(state='NEW', time=[1.0, 2.0])) \
+                                               == ['task.000001']
+        assert uids(session.get(uid='task.000002', state='NEW')) \
+                                               == ['task.000002']
+        assert uids(session.get(etype='task', state='no such state')) == []
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_filter(self, session):
+        """Filtered sessions only find the remaining entities"""
+
+        done = session.filter(state=['DONE', 'FAILED'], inplace=False)
+        assert [e.uid for e in done.get(etype='task')] == ['task.000000',
+                                                           'task.000001']
+        assert [e.uid for e in done.get(state='NEW')]  == ['pilot.0000',
+                                                           'task.000000',
+                                                           'task.000001']
+
+        session.filter(etype='task', inplace=True)
+        assert [e.uid for e in session.get(state='DONE')] == ['task.000000']
+        assert session.list('etype') == ['task']
+
+        # the cloned session is not affected by the in-place filter
+        assert len(done.get(etype='pilot')) == 1
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_properties(self, session):
+        """Properties are counted on first use, and pruned on filtering"""
+
+        assert session._properties is None
+        assert session.t_range == [0.0, 9.0]
+
+        stats = session.describe('statistics')
+        assert stats['etype']['task']  == 3
+        assert stats['etype']['pilot'] == 1
+        assert stats['state'] == {'NEW': 4, 'PMGR_ACTIVE': 1,
+                                  'DONE': 2, 'FAILED': 1}
+        assert stats['event']['exec_start'] == 2
+
+        tasks = session.filter(etype='task', inplace=False)
+        assert tasks._properties is None
+        assert tasks.t_range == [0.5, 6.5]
+
+        pruned = tasks.describe('statistics')
+        tasks._properties = None
+        assert tasks.describe('statistics') == pruned
+        assert pruned['state'] == {'NEW': 3, 'DONE': 1, 'FAILED': 1}
+        assert pruned['event'] == {'state': 5, 'exec_start': 2,
+                                   'exec_stop': 2}
+
+        session.filter(uid='task.000002', inplace=True)
+        assert session.describe('statistics')['uid'] == {'task.000002': 1}
+        assert session.ttc == 0.0
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_view(self, session):
+        """Session views select entities without copying the session"""
+
+        tasks = session.filter(etype='task', inplace=False)
+        assert isinstance(tasks, ra.SessionView)
+        assert tasks._store is session._store
+        assert tasks.get(uid='task.000001')[0] is \
+               session.get(uid='task.000001')[0]
+
+        # nested views
+        done = tasks.filter(state=['DONE', 'FAILED'], inplace=False)
+        assert [e.uid for e in done.get()] == ['task.000000', 'task.000001']
+        assert done.list('uid') == ['task.000000', 'task.000001']
+        assert done.get(uid='task.000002') == []
+        assert done.get(etype='pilot') == []
+
+        event = [{1: 'exec_start'}, {1: 'exec_stop'}]
+        assert done.ranges(event=event) == [[2.0, 3.0], [4.0, 6.0]]
+        assert done.duration(event=event) == 3.0
+        assert done.timestamps(state='NEW') == [0.5, 1.5]
+        assert done.concurrency(event=event) == [[2.0, 0], [2.0, 1],
+                                                 [3.0, 0], [4.0, 1],
+                                                 [6.0, 0]]
+        assert done.rate(event={1: 'exec_start'}) == [[4.0, 1.0]]
+
+        # filtering a view in place does not affect its parent
+        done.filter(state='FAILED', inplace=True)
+        assert done.list('uid')  == ['task.000001']
+        assert tasks.list('uid') == ['task.000000', 'task.000001',
+                                     'task.000002']
+        assert len(session.get()) == 5
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_ranges(self, session):
+        """Ranges are found for all entities at once, as per entity"""
+
+        event = [{1: 'exec_start'}, {1: 'exec_stop'}]
+        starts, stops, owners = session._ranges(event=event)
+        assert starts.tolist() == [2.0, 4.0]
+        assert stops.tolist()  == [3.0, 6.0]
+        assert [list(session._entities)[o] for o in owners] == \
+               ['task.000000', 'task.000001']
+
+        # a final event can also start the next range
+        state = ['NEW', ['NEW', 'PMGR_ACTIVE', 'DONE']]
+        for kwargs in [{'state': state},
+                       {'state': state, 'time': [[0.0, 1.0], [2.0, 9.0]]},
+                       {'event': [{1: 'state'}, {1: 'state'}]},
+                       {'event': [{1: 'state'}, {1: 'state'}], 'expand': True}]:
+            starts, stops, owners = session._ranges(**kwargs)
+            found = [list() for _ in session.get()]
+            for start, stop, owner in zip(starts, stops, owners):
+                found[owner].append([start, stop])
+            assert found == [e.ranges(collapse=False, **kwargs)
+                             for e in session.get()]
+
+        assert session.ranges(event=event, time=[2.5, 5.0]) == [[2.5, 3.0],
+                                                                [4.0, 5.0]]
+        assert session.ranges(event=event, collapse=False) == [[2.0, 3.0],
+                                                               [4.0, 6.0]]
+
+        # collapsed ranges
+        starts, stops = session.ranges(state=['NEW', ['DONE', 'FAILED']],
+                                       as_array=True)
+        assert starts.tolist() == [0.5]
+        assert stops.tolist()  == [9.0]
+        assert session.duration(ranges=[[4.0, 6.0], [1.0, 2.0], [1.5, 3.0]]) \
+                                                                       == 4.0
+        assert session.duration(event=event, time=[2.5, 5.0]) == 1.5
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_durations(self, session):
+        """Durations are returned per entity, NaN where undefined"""
+
+        tasks = session.filter(etype='task', inplace=False)
+        durations = tasks.durations(
+                {'exec' : [{1: 'exec_start'}, {1: 'exec_stop'}],
+                 'total': {'state': ['NEW', ['DONE', 'FAILED']]}})
+
+        assert durations['exec'] [:2].tolist() == [1.0, 2.0]
+        assert durations['total'][:2].tolist() == [3.0, 5.0]
+        assert np.isnan(durations['exec'] [2])
+        assert np.isnan(durations['total'][2])
+
+        clipped = tasks.durations({'exec': [{1: 'exec_start'},
+                                            {1: 'exec_stop'}]},
+                                  time=[2.5, 5.0])
+        assert clipped['exec'][:2].tolist() == [0.5, 1.0]
+
+        missing = tasks.durations({'none': [{1: 'foo'}, {1: 'bar'}]})
+        assert np.isnan(missing['none']).all()
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_tzero(self, session, tmp_path):
+        """tzero shifts all reported times, but not the stored events"""
+
+        raw  = session._store.time.copy()
+        task = session.get(uid='task.000001')[0]
+        assert task.t_range == [1.5, 6.5]
+
+        session.tzero(1.0)
+        session.tzero(1.5)
+
+        assert (session._store.time == raw).all()
+        assert session.t_range == [-1.5, 7.5]
+        assert task.t_range    == [ 0.0, 5.0]
+        assert task.events[0][0] == 0.0
+        assert task.states['FAILED'][0] == 5.0
+        assert session.timestamps(state='NEW') == [-1.0, -1.0, 0.0, 1.0]
+        assert session.ranges(event=[{1: 'exec_start'}, {1: 'exec_stop'}]) \
+                                                == [[0.5, 1.5], [2.5, 4.5]]
+        assert [e.uid for e in session.get(event='exec_start',
+                                           time=[2.0, 3.0])] == ['task.000001']
+
+        # the offset is retained in snapshots
+        session.save(str(tmp_path / 'snap'))
+        loaded = ra.Session.load(str(tmp_path / 'snap'))
+        assert loaded.t_range == [-1.5, 7.5]
+        assert loaded.get(uid='task.000001')[0].t_range == [0.0, 5.0]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_memoize(self, session):
+        """Query results are memoized on request, and dropped when outdated"""
+
+        event = [{1: 'exec_start'}, {1: 'exec_stop'}]
+        assert session.memo_stats() is None
+
+        session.memoize(size=2)
+        ranges = session.ranges(event=event)
+        assert session.ranges(None, event, collapse=True) == ranges
+        assert session.memo_stats() == {'hits': 1, 'misses': 1,
+                                        'entries': 1, 'size': 2}
+
+        # callers get copies of the memoized results
+        ranges[0][0] = -1.0
+        assert session.ranges(event=event)[0] == [2.0, 3.0]
+
+        # least recently used results are dropped
+        session.get(etype='task')
+        session.timestamps(state='NEW')
+        assert session.memo_stats()['entries'] == 2
+        assert session.memo_stats()['misses']  == 3
+
+        # views memoize their own results
+        tasks = session.filter(etype='task', inplace=False)
+        assert tasks.memo_stats()['entries'] == 0
+        assert len(tasks.get(state='NEW')) == 3
+
+        # tzero changes and in-place filters invalidate the results
+        tasks.tzero(1.0)
+        assert session.ranges(event=event) == [[1.0, 2.0], [3.0, 5.0]]
+        session.tzero(0.0)
+
+        session.filter(uid='task.000001', inplace=True)
+        assert session.timestamps(state='NEW') == [1.5]
+        assert tasks.timestamps(state='NEW') == [0.5, 1.5, 2.5]
+
+        session.memoize(0)
+        assert session.memo_stats() is None
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_snapshot(self, session, tmp_path):
+        """Session snapshots are loaded with memory mapped event columns"""
+
+        # state values are keyed by (integer) state order
+        session._description['entities'] = {
+                'task': {'state_model' : None,
+                         'state_values': {idx: 'STATE_%d' % idx
+                                          for idx in range(-1, 16)},
+                         'event_model' : None}}
+
+        session.filter(etype='task', inplace=True)
+        session.save(str(tmp_path / 'snap'))
+
+        loaded = ra.Session.load(str(tmp_path / 'snap'))
+
+        assert loaded.uid == session.uid
+        assert loaded.t_range == session.t_range
+        assert loaded.describe('statistics') == session.describe('statistics')
+        assert loaded.describe('state_values') == \
+               session.describe('state_values')
+        assert sorted(loaded.describe('state_values', etype='task')
+                            ['task']['state_values'])[-1] == 15
+        assert [e.uid for e in loaded.get()] == [e.uid for e in session.get()]
+        assert [e.uid for e in loaded.get(state='DONE')] == ['task.000000']
+
+        assert loaded.get(uid='task.000001')[0].events == \
+               session.get(uid='task.000001')[0].events
+        assert loaded.ranges(event=[{1: 'exec_start'}, {1: 'exec_stop'}]) == \
+               [[2.0, 3.0], [4.0, 6.0]]
+
+        # the event columns are read-only memory maps
+        assert not loaded._store.time.flags.writeable
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_lazy_entities(self, session):
+        """Entities are only created when they are accessed"""
+
+        created = session._entities._cache._entities
+        assert not created
+
+        assert session.describe('statistics')['etype']['task'] == 3
+        assert not created
+
+        pilots = session.get(etype='pilot')
+        assert [e.uid for e in pilots] == ['pilot.0000']
+        assert len(created) == 1
+
+        # views share the created entities with their session
+        view = session.filter(etype='task', state='NEW', inplace=False)
+        assert 'pilot.0000' not in view._entities
+        assert view.list('etype') == ['task']
+        assert len(created) == 1
+
+        assert view.get(uid='task.000001')[0] is \
+               session.get(uid='task.000001')[0]
+        assert len(created) == 2
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_consistency(self, session):
+        """State model consistency is recorded on the entities"""
+
+        session._description['entities'] = {
+                'task': {'state_model' : None,
+                         'state_values': {0: 'NEW',
+                                          1: ['DONE', 'FAILED', 'CANCELED']},
+                         'event_model' : None}}
+
+        assert session.consistency() == ['task.000002']
+
+        tasks = session.get(etype='task')
+        assert [t.consistency['state_model'] for t in tasks] == \
+               [True, True, False]
+        assert tasks[2].consistency['log'] == ['missing final state']
+
+        # entities without a state model are not checked
+        pilot = session.get(etype='pilot')[0]
+        assert pilot.consistency['state_model'] is None
+
+
 # ------------------------------------------------------------------------------
 
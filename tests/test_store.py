@@ -0,0 +1,137 @@
+
+import os
+import json
+import pytest
+import radical.utils as ru
+
+from radical.analytics.store import EventStore, in_ranges
+
+
+# Test Directory use to load example json files
+base = "%s/example-data" % os.path.dirname(__file__)
+
+
+# ------------------------------------------------------------------------------
+#
+@pytest.fixture
+def profile():
+    """Fixture to get a profile with events for several entities"""
+
+    events = list()
+    for name in ['pilot', 'pmgr', 'rp']:
+        with ru.ru_open("%s/%s-entity-example.json" % (base, name), 'r') as f:
+            entity = json.load(f)
+            events.extend([tuple(event) for event in entity['events']])
+
+    return sorted(events, key=lambda x: x[ru.TIME])
+
+
+# ------------------------------------------------------------------------------
+#
+class TestEventStore(object):
+
+    # --------------------------------------------------------------------------
+    #
+    def test_grouped(self, profile):
+        """Events are grouped by uid and time sorted per entity"""
+
+        store = EventStore(profile)
+
+        assert len(store) == len(profile)
+        assert store.uids == list(dict.fromkeys(e[ru.UID] for e in profile))
+
+        for eid, uid in enumerate(store.uids):
+            begin, end = store.span(eid)
+            expected   = [e for e in profile if e[ru.UID] == uid]
+            assert store.events(begin, end) == expected
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_rows(self, profile):
+        """Row indexes of entity subsets are concatenated entity slices"""
+
+        store = EventStore(profile)
+        rows  = store.rows([1, 0])
+
+        assert list(rows) == list(range(*store.span(1))) \
+                           + list(range(*store.span(0)))
+        assert not len(store.rows([]))
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_advance(self):
+        """'advance' events are renamed to 'state' events"""
+
+        store = EventStore([(1.0, 'advance', 'c', 't', 'x.1', 'NEW', '', 'x'),
+                            (0.5, 'state',   'c', 't', 'x.1', 'OLD', '', 'x')])
+
+        assert store.vocab(ru.EVENT) == ['state']
+        assert [e[ru.STATE] for e in store.events()] == ['OLD', 'NEW']
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_match(self, profile):
+        """Conditions match exact fields, and message substrings"""
+
+        store = EventStore(profile)
+        cond  = [None] * ru.PROF_KEY_MAX
+
+        cond[ru.EVENT] = 'state'
+        mask = store.match(cond)
+        assert mask.sum() == len([e for e in profile if e[ru.EVENT] == 'state'])
+
+        cond[ru.EVENT] = 'no such event'
+        assert not store.match(cond).any()
+
+        msg = [e[ru.MSG] for e in profile if e[ru.MSG]][0]
+        cond[ru.EVENT] = None
+        cond[ru.MSG]   = msg[1:]
+        assert store.match(cond).sum() == \
+               len([e for e in profile if msg[1:] in e[ru.MSG]])
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_in_ranges(self):
+        """Times are matched against single and multiple time ranges"""
+
+        times = [0.0, 1.0, 2.0, 3.0]
+
+        assert list(in_ranges(times, [1.0, 2.0])) == [0, 1, 1, 0]
+        assert list(in_ranges(times, [[0, 0], [3, 4]])) == [1, 0, 0, 1]
+        assert list(in_ranges(times, None)) == [0, 0, 0, 0]
+
+
+    # --------------------------------------------------------------------------
+    #
+    def test_window(self, profile):
+        """Rows in time ranges are found via the time index"""
+
+        store = EventStore(profile)
+        times = store.times()
+        t_min = times.min()
+
+        for ranges in [[t_min + 10, t_min + 20],
+                       [[t_min + 30, t_min + 40], [t_min, t_min + 5]],
+                       [t_min - 2, t_min - 1], None]:
+            expected = in_ranges(times, ranges).nonzero()[0]
+            assert list(store.window(ranges)) == list(expected)
+
+        # within the time sorted events of an entity
+        begin, end = store.span(1)
+        ranges     = [times[begin + 1], times[end - 2]]
+        expected   = in_ranges(times[begin:end], ranges).nonzero()[0] + begin
+        assert list(store.window(ranges, begin, end)) == list(expected)
+        assert len(expected) < end - begin
+
+        # shifted by tzero
+        store.set_tzero(t_min + 10)
+        assert list(store.window([0, 10])) == \
+               list(in_ranges(times, [t_min + 10, t_min + 20]).nonzero()[0])
+
+
+# ------------------------------------------------------------------------------
+